@@ -0,0 +1,109 @@
+"""
+Generate a synthetic Compass package for benchmarking the rendering path
+
+    python benchmarks/compass_generator.py <path> [--objects 10] [--types 3] [--loop-size 20] [--if-density 0.5]
+
+Every object has each of the component types, every component type has a
+template with a for loop over a list of loop-size elements and a number of
+fields, if-density of which are wrapped in a conditional block. The config
+also references an interactive variable so handle_variables has work to do
+"""
+import argparse
+import json
+import os
+
+# fields in each template outside of the loop, if_density of them are conditional
+TEMPLATE_FIELDS = 10
+
+def type_name(t):
+    return 'type{}'.format(t)
+
+def make_template(obj_type, if_density):
+    """ Template for a component type, a ConfigMap filled in from the object settings and a loop """
+    conditionals = int(round(TEMPLATE_FIELDS * if_density))
+    lines = [
+        '{',
+        '    "components": {',
+        '        "meta": {',
+        '            "type": "Components.Metadata",',
+        '            "fields": {',
+        '                "name": "${config.__settings__.name}",',
+        '                "labels": "${config.__settings__.labels}"',
+        '            }',
+        '        },',
+        '        "cm": {',
+        '            "type": "APIResources.ConfigMap",',
+        '            "fields": {',
+        '                "metadata": "${.meta}",',
+        '                "data": {',
+        '                    // {% for item in obj.' + obj_type + '.items %}',
+        '                    "${item.__name__}": "${item.value}",',
+        '                    // {% end for %}',
+    ]
+    for f in range(0, TEMPLATE_FIELDS):
+        field = '                    "field{}": "${{config.__settings__.fields.field{}}}",'.format(f, f)
+        if f < conditionals:
+            # alternate between conditions that hold and ones that don't
+            operator = '==' if f % 2 == 0 else '!='
+            lines.append('                    // {% if obj.__settings__.env ' + operator + ' "prod" %}')
+            lines.append(field)
+            lines.append('                    // {% end if %}')
+        else:
+            lines.append(field)
+    lines += [
+        '                    "type": "' + obj_type + '"',
+        '                }',
+        '            }',
+        '        }',
+        '    },',
+        '    "return": "cm"',
+        '}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+def make_config(objects, types, loop_size):
+    """ Config for the Compass, each object has every component type """
+    config = {'objects': []}
+    for o in range(0, objects):
+        obj = {
+            '__settings__': {
+                'name': 'object{}'.format(o),
+                'env': '${var.env|dev}',
+                'labels': {'app': 'object{}'.format(o), 'index': str(o)},
+                'fields': {'field{}'.format(f): 'value{}'.format(f) for f in range(0, TEMPLATE_FIELDS)}
+            }
+        }
+        for t in range(0, types):
+            obj[type_name(t)] = {
+                'items': [{'item{}'.format(i): {'value': 'object{}-item{}'.format(o, i)}} for i in range(0, loop_size)]
+            }
+        config['objects'].append({'object{}'.format(o): obj})
+    return config
+
+def make_compass(path, objects=10, types=3, loop_size=20, if_density=0.5):
+    """ Write out a Compass package to path, returning the path to its config """
+    for t in range(0, types):
+        template_dir = os.path.join(path, 'templates', type_name(t))
+        os.makedirs(template_dir, exist_ok=True)
+        with open(os.path.join(template_dir, 'template.json'), 'w') as f:
+            f.write(make_template(type_name(t), if_density))
+
+    config_path = os.path.join(path, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump(make_config(objects, types, loop_size), f, indent=4)
+    with open(os.path.join(path, 'interactive.yaml'), 'w') as f:
+        f.write('- prompt: "Environment: "\n  variable: env\n')
+    return config_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic Compass generator')
+    parser.add_argument('path')
+    parser.add_argument('--objects', type=int, default=10)
+    parser.add_argument('--types', type=int, default=3)
+    parser.add_argument('--loop-size', type=int, default=20)
+    parser.add_argument('--if-density', type=float, default=0.5)
+    args = parser.parse_args()
+    print(make_compass(args.path, args.objects, args.types, args.loop_size, args.if_density))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare the per-render cost of deep copying the config data against reading
+it through a utils.ConfigView, both for template lookups and for the builder
+resolving ${config.__settings__.*} references
+
+    python benchmarks/config_view.py [--size-mb 2] [--elements 50]
+
+Each mode runs in its own process so that the peak RSS reported is only
+from that mode, the render peak is the most memory allocated at once while
+rendering the elements
+"""
+import argparse
+import copy
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wheel_house'))
+import utils
+import manifest_builder
+
+# a configmap built from three settings and the element, the way the builder reads them from the config
+DEFINITION = {
+    'components': {
+        'meta': {'type': 'Components.Metadata', 'fields': {'name': '${config.__this__.__name__}'}},
+        'cm': {'type': 'APIResources.ConfigMap', 'fields': {'metadata': '${.meta}', 'data': {
+            'a': '${config.__settings__.key0.value}',
+            'b': '${config.__settings__.key1.value}',
+            'c': '${config.__settings__.key2.items}'
+        }}}
+    },
+    'return': 'cm'
+}
+
+def make_config(size_mb, elements):
+    """ Build a config with a single object holding a list component and padding data """
+    entry = {'value': 'x' * 64, 'items': list(range(16))}
+    count = int(size_mb * 1024 * 1024 / len(json.dumps(entry)))
+    padding = {'key{}'.format(i): copy.deepcopy(entry) for i in range(0, count)}
+    obj = {
+        '__settings__': padding,
+        'deployment': [{'element{}'.format(e): {'image': 'nginx', 'port': e}} for e in range(0, elements)]
+    }
+    return {'objects': [{'app': obj}]}
+
+def render_deepcopy(config_data, obj_data, el):
+    # what compose used to do for every element, the copy of the whole config was passed along but never read
+    copy.deepcopy(config_data)
+    data = copy.deepcopy(obj_data)
+    name = list(el.keys())[0]
+    data['__this__'] = el[name]
+    data['__this__']['__name__'] = name
+    return utils.get_from_key_list(data, ['__this__', 'port'])
+
+def render_view(config_data, obj_data, el):
+    data = utils.ConfigView(obj_data)
+    name = list(el.keys())[0]
+    this = dict(el[name])
+    this['__name__'] = name
+    data.set(['__this__'], this)
+    return utils.get_from_key_list(data, ['__this__', 'port'])
+
+def build_deepcopy(config_data, obj_data, el):
+    # the builder was given a copy of the object data for every element
+    data = copy.deepcopy(obj_data)
+    name = list(el.keys())[0]
+    data['__this__'] = dict(el[name], __name__=name)
+    return manifest_builder.ManifestBuilder().build_manifest(definition=copy.deepcopy(DEFINITION), config=data)
+
+def build_view(config_data, obj_data, el):
+    data = utils.ConfigView(obj_data)
+    name = list(el.keys())[0]
+    data.set(['__this__'], dict(el[name], __name__=name))
+    return manifest_builder.ManifestBuilder().build_manifest(definition=copy.deepcopy(DEFINITION), config=data)
+
+MODES = {
+    'deepcopy': render_deepcopy,
+    'view': render_view,
+    'build_deepcopy': build_deepcopy,
+    'build_view': build_view
+}
+
+def run(mode, size_mb, elements):
+    config_data = make_config(size_mb, elements)
+    obj_data = config_data['objects'][0]['app']
+    render = MODES[mode]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for el in obj_data['deployment']:
+        render(config_data, obj_data, el)
+    elapsed = time.perf_counter() - start
+    render_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # ru_maxrss is in kilobytes on linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'mode': mode, 'seconds': elapsed, 'peak_rss_kb': peak, 'render_peak_kb': render_peak // 1024}))
+
+def main():
+    parser = argparse.ArgumentParser(description='Config copy benchmark')
+    parser.add_argument('--size-mb', type=float, default=2)
+    parser.add_argument('--elements', type=int, default=50)
+    parser.add_argument('--mode', choices=list(MODES))
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.mode, args.size_mb, args.elements)
+        return
+
+    results = {}
+    for mode in MODES:
+        out = subprocess.check_output([sys.executable, __file__, '--mode', mode, '--size-mb', str(args.size_mb), '--elements', str(args.elements)])
+        results[mode] = json.loads(out)
+
+    print('{:16s} {:>12s} {:>16s} {:>20s}'.format('Mode', 'Seconds', 'Peak RSS (KB)', 'Render peak (KB)'))
+    for mode in results:
+        print('{:16s} {:12.3f} {:16d} {:20d}'.format(mode, results[mode]['seconds'], results[mode]['peak_rss_kb'], results[mode]['render_peak_kb']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark list and search requests for many names against a local stub of
+the frontend API which adds latency to every response
+
+    python benchmarks/fanout.py [--names 200] [--latency 0.05] [--concurrency 1 8 32] [--output results.json]
+
+The stub answers every name with a couple of versions (with an ETag) and
+counts the requests it is sent. Each concurrency is timed on a fresh
+response cache, followed by a run with a TTL over the cache it left behind.
+The results are printed as a table followed by a line of JSON (and written to
+output if it is given). The stub can also be started on its own with --serve
+to point the CLI at it with --api-url
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wheel_house'))
+import cache
+import utils
+from client import CompassClient
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    # keep connections alive so the client's pool is what gets measured, the
+    # headers and body are written separately so nagle would delay the body
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.count()
+        time.sleep(self.server.latency)
+        name = self.path.rstrip('/').split('/')[-1]
+        if self.path.startswith('/api/getCompassObjectsByName/'):
+            data = {'compasses': [{'name': name, 'version': v} for v in ['1.0.0', '1.1.0']]}
+        elif self.path.startswith('/api/getCompassObjectsByFuzzyName/'):
+            data = {'matches': [name, name + '-extra']}
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(data).encode()
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, port=0):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+def start_stub_server(latency, port=0):
+    server = StubServer(latency, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run(server, names, concurrency, cache_dir, ttl=0):
+    """ Look up every name, returning the seconds taken, requests sent and failures """
+    client = CompassClient(server.url, pool_size=concurrency, responses=cache.ResponseCache(cache_dir), ttl=ttl)
+    before = server.requests
+    start = time.perf_counter()
+    failed = sum(1 for name, data, error in utils.fetch_many(client.get_compasses, names, concurrency) if error != None)
+    seconds = time.perf_counter() - start
+    client.close()
+    return {'seconds': seconds, 'requests': server.requests - before, 'failed': failed, 'names_per_second': len(names) / seconds}
+
+def main():
+    parser = argparse.ArgumentParser(description='List and search fan out benchmarks')
+    parser.add_argument('--names', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the stub waits before every response')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='only run the stub server on this port')
+    args = parser.parse_args()
+
+    if args.serve:
+        server = StubServer(args.latency, args.serve)
+        print('Stub frontend API listening on {}'.format(server.url))
+        server.serve_forever()
+        return
+
+    server = start_stub_server(args.latency)
+    names = ['compass-{}'.format(i) for i in range(0, args.names)]
+    results = {'params': {'names': args.names, 'latency': args.latency}, 'runs': {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for concurrency in args.concurrency:
+            cache_dir = os.path.join(work_dir, str(concurrency))
+            results['runs']['concurrency_{}'.format(concurrency)] = run(server, names, concurrency, cache_dir)
+            results['runs']['concurrency_{}_cached'.format(concurrency)] = run(server, names, concurrency, cache_dir, ttl=60)
+    server.shutdown()
+
+    print('{:24s} {:>10s} {:>10s} {:>8s} {:>12s}'.format('Run', 'Seconds', 'Requests', 'Failed', 'Names/s'))
+    for name in results['runs']:
+        r = results['runs'][name]
+        print('{:24s} {:10.4f} {:10d} {:8d} {:12.1f}'.format(name, r['seconds'], r['requests'], r['failed'], r['names_per_second']))
+    print(json.dumps(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == '__main__':
+    main()
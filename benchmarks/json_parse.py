@@ -0,0 +1,109 @@
+"""
+Benchmark parsing the text rendered from large templates, the regexes and
+json.loads they were parsed with before against relaxed_json
+
+    python benchmarks/json_parse.py [--loop-size 1000 10000] [--if-density 0.5] [--repeat 5] [--output results.json]
+
+A template from the synthetic Compass is rendered for each loop size, once
+as it is and once as JSONC: with a comment on every loop element and a
+trailing comma at the end of every object. The regex path can't parse the
+JSONC text (json.loads fails on the comments), relaxed_json.loads takes its
+fast path for the plain text and does the single pass which drops the
+comments and commas for the JSONC text. The best of repeat runs of each is
+kept and the outputs checked to be equal. The results are printed as a
+table followed by a line of JSON (and written to output if it is given)
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wheel_house'))
+import compass_generator
+import relaxed_json
+import serializers
+import template
+import utils
+
+# the comma fixups rendered templates went through before
+OBJECT_COMMA_PATTERN = re.compile(r',\n\s*\}')
+ARRAY_COMMA_PATTERN = re.compile(r',\n\s*\]')
+
+def regex_loads(text):
+    text = OBJECT_COMMA_PATTERN.sub('\n}', text)
+    text = ARRAY_COMMA_PATTERN.sub('\n]', text)
+    return serializers.load_json(text)
+
+def make_jsonc(contents):
+    """ Add a comment to the loop body and a trailing comma to the end of each object of a template """
+    contents = contents.replace('// {% end for %}', '// the value for an element\n                    // {% end for %}')
+    return re.sub(r'("|\})\n(\s*\})', r'\1, // end\n\2', contents)
+
+def best_of(repeat, func, *args):
+    best = None
+    for r in range(0, repeat):
+        start = time.perf_counter()
+        out = func(*args)
+        elapsed = time.perf_counter() - start
+        if best == None or elapsed < best:
+            best = elapsed
+    return best, out
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendered template parsing benchmarks')
+    parser.add_argument('--loop-size', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--if-density', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = {'params': {'if_density': args.if_density}, 'json': serializers.get_backends()['json'], 'runs': {}}
+    work_dir = tempfile.mkdtemp()
+    try:
+        for loop_size in args.loop_size:
+            compass_path = os.path.join(work_dir, str(loop_size))
+            config_path = compass_generator.make_compass(compass_path, 1, 1, loop_size, args.if_density)
+            config_data = utils.read_file(config_path)
+            obj_data = utils.ConfigView(list(config_data['objects'][0].values())[0])
+            with open(utils.find_template(os.path.join(compass_path, 'templates'), compass_generator.type_name(0))) as f:
+                contents = f.read()
+
+            for kind, source in [('json', contents), ('jsonc', make_jsonc(contents))]:
+                text = template.compile_template(source).render(obj_data)
+                run = {'loop_size': loop_size, 'bytes': len(text.encode())}
+                expected = None
+                for name, loads in [('regex', regex_loads), ('relaxed', relaxed_json.loads)]:
+                    try:
+                        seconds, out = best_of(args.repeat, loads, text)
+                    except ValueError:
+                        # the regexes leave the comments in
+                        run[name] = None
+                        continue
+                    if expected != None and out != expected:
+                        print('Output mismatch for {} {}'.format(kind, loop_size))
+                        exit(1)
+                    expected = out
+                    run[name] = seconds
+                results['runs']['{}_{}'.format(kind, loop_size)] = run
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    def format_seconds(seconds):
+        return '{:12.5f}'.format(seconds) if seconds != None else '{:>12s}'.format('fails')
+
+    print('{:16s} {:>10s} {:>12s} {:>12s}'.format('Run', 'KB', 'Regex (s)', 'Relaxed (s)'))
+    for name in results['runs']:
+        r = results['runs'][name]
+        print('{:16s} {:10d} {} {}'.format(name, r['bytes'] // 1024, format_seconds(r['regex']), format_seconds(r['relaxed'])))
+    print(json.dumps(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Benchmark the stages of the rendering path against a synthetic Compass
+
+    python benchmarks/render.py [--objects 10] [--types 3] [--loop-size 20] [--if-density 0.5]
+                                [--repeat 3] [--output results.json] [--baseline results.json] [--tolerance 0.2]
+
+Each stage is timed on its own, the best of repeat runs is kept and the peak
+memory allocated during a separate traced run is reported alongside it. The
+results are printed as a table followed by a line of JSON (and written to
+output if it is given). When a baseline from an earlier run is passed, any
+stage more than tolerance slower than it is reported and the exit code is 1
+"""
+import argparse
+import copy
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wheel_house'))
+import build_db
+import compass_generator
+import template
+import utils
+import wheel_house
+from wheel_house import WheelHouse
+from k8sgen import data_file
+
+USER_IN = {'env': 'prod'}
+
+def get_inputs(compass_path, config_path):
+    """ Read in everything the stages work on so that none of it is timed """
+    with open(config_path) as f:
+        config = f.read()
+    config_data = utils.read_data(config_path, WheelHouse(parse_args=False).handle_variables(config, USER_IN))
+
+    # every object with each of its component types, along with the template contents
+    renders = []
+    contents = {}
+    for obj_dict in config_data['objects']:
+        obj = list(obj_dict.keys())[0]
+        for obj_type in obj_dict[obj]:
+            if obj_type.startswith('__'):
+                continue
+            if not obj_type in contents:
+                with open(utils.find_template(os.path.join(compass_path, 'templates'), obj_type)) as f:
+                    contents[obj_type] = f.read()
+            renders.append((obj, obj_dict[obj], obj_type))
+
+    # the k8sgen resource definitions are what clean_null and recurse_expand walk for every manifest
+    skeletons = [r['json'] for r in data_file.k8sgen_data['api_resources_data'].values()]
+    return {
+        'config': config,
+        'config_data': config_data,
+        'renders': renders,
+        'contents': contents,
+        'skeletons': skeletons,
+        'components': list(data_file.k8sgen_data['components'])
+    }
+
+def stage_compose(wh, inputs, compass_path, config_path, out_dir):
+    return wh.compose(compass_path, config_path, USER_IN, 'NONE', out_dir=out_dir)
+
+def stage_compose_stream(wh, inputs, compass_path, config_path, out_path):
+    with open(out_path, 'w', buffering=wheel_house.OUTPUT_BUFFER_SIZE) as stream:
+        return wh.compose(compass_path, config_path, USER_IN, 'NONE', stream=stream)
+
+def stage_render(wh, inputs, compass_path):
+    return sum(1 for r in wh.render(compass_path, USER_IN))
+
+def stage_compose_unchanged(wh, inputs, compass_path, config_path, out_dir, builds):
+    wh.compose(compass_path, config_path, USER_IN, 'NONE', out_dir=out_dir, builds=builds)
+    return len(inputs['renders'])
+
+def stage_handle_variables(wh, inputs):
+    wh.handle_variables(inputs['config'], USER_IN)
+    return 1
+
+def stage_read_config(wh, inputs, config_path):
+    wh.read_config(config_path, USER_IN)
+    return 1
+
+def stage_template_render(wh, inputs):
+    compiled = {obj_type: template.compile_template(inputs['contents'][obj_type]) for obj_type in inputs['contents']}
+    for obj, obj_data, obj_type in inputs['renders']:
+        compiled[obj_type].render(utils.ConfigView(obj_data))
+    return len(inputs['renders'])
+
+def stage_recurse_expand(wh, inputs, data):
+    for d in data:
+        utils.recurse_expand(d, inputs['components'])
+    return len(data)
+
+def stage_clean_null(wh, inputs, data):
+    for d in data:
+        utils.clean_null(d)
+    return len(data)
+
+def get_stages(wh, inputs, compass_path, config_path, out_dir):
+    """
+    Map each stage name to a function returning the arguments for a run
+    (fresh ones for stages that change their input) and the stage itself
+    """
+    manifests = len(inputs['renders'])
+    def walked():
+        # one of each resource definition for every manifest
+        return [copy.deepcopy(s) for s in inputs['skeletons'] for m in range(0, manifests)]
+    def expanded():
+        return [utils.recurse_expand(d, inputs['components']) for d in walked()]
+    def parsed():
+        # the config was already read with other answers, so only the variables are filled in
+        wh.read_config(config_path, {})
+        return (wh, inputs, config_path)
+    def unparsed():
+        wh.configs = None
+        return (wh, inputs, config_path)
+    def cold(*args):
+        # nothing built by an earlier run is reused
+        wh.memo = None
+        return (wh, inputs) + args
+    def memoized():
+        # every manifest was built by an earlier render with the same answers
+        cold()
+        stage_render(wh, inputs, compass_path)
+        return (wh, inputs, compass_path)
+    def unchanged():
+        # a build of every manifest to compare the re-render against
+        incremental_dir = out_dir + '-incremental'
+        if not os.path.exists(incremental_dir):
+            os.makedirs(incremental_dir)
+            wh.compose(compass_path, config_path, USER_IN, 'NONE', out_dir=incremental_dir, builds=build_db.BuildDatabase(incremental_dir))
+        return (wh, inputs, compass_path, config_path, incremental_dir, build_db.BuildDatabase(incremental_dir))
+
+    return {
+        'compose': (lambda: cold(compass_path, config_path, out_dir), stage_compose),
+        'compose_stream': (lambda: cold(compass_path, config_path, out_dir + '.yaml'), stage_compose_stream),
+        'compose_unchanged': (unchanged, stage_compose_unchanged),
+        'render': (lambda: cold(compass_path), stage_render),
+        'render_memoized': (memoized, stage_render),
+        'handle_variables': (lambda: (wh, inputs), stage_handle_variables),
+        'read_config': (unparsed, stage_read_config),
+        'fill_variables': (parsed, stage_read_config),
+        'template_render': (lambda: (wh, inputs), stage_template_render),
+        'recurse_expand': (lambda: (wh, inputs, walked()), stage_recurse_expand),
+        'clean_null': (lambda: (wh, inputs, expanded()), stage_clean_null),
+    }
+
+def run_stage(get_args, stage, repeat):
+    """ Time a stage, keeping the best of repeat runs, then trace a run for its peak memory """
+    best = None
+    for r in range(0, repeat):
+        args = get_args()
+        start = time.perf_counter()
+        items = stage(*args)
+        elapsed = time.perf_counter() - start
+        if best == None or elapsed < best:
+            best = elapsed
+
+    args = get_args()
+    tracemalloc.start()
+    stage(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'seconds': best,
+        'items': items,
+        'items_per_second': items / best if best else 0,
+        'peak_kb': peak // 1024
+    }
+
+def compare(results, baseline, tolerance):
+    """ Get the stages which are more than tolerance slower than the baseline """
+    regressions = []
+    for stage in results['stages']:
+        if not stage in baseline['stages']:
+            continue
+        before = baseline['stages'][stage]['seconds']
+        after = results['stages'][stage]['seconds']
+        if before and after > before * (1 + tolerance):
+            regressions.append((stage, before, after))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendering path benchmarks')
+    parser.add_argument('--objects', type=int, default=10)
+    parser.add_argument('--types', type=int, default=3)
+    parser.add_argument('--loop-size', type=int, default=20)
+    parser.add_argument('--if-density', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', nargs='+', help='only run these stages')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--baseline', help='results from an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        compass_path = os.path.join(work_dir, 'compass')
+        out_dir = os.path.join(work_dir, 'out')
+        os.makedirs(out_dir)
+        config_path = compass_generator.make_compass(compass_path, args.objects, args.types, args.loop_size, args.if_density)
+
+        wh = WheelHouse(parse_args=False)
+        wh.set_log_level('NONE')
+        inputs = get_inputs(compass_path, config_path)
+        stages = get_stages(wh, inputs, compass_path, config_path, out_dir)
+
+        results = {
+            'params': {
+                'objects': args.objects,
+                'types': args.types,
+                'loop_size': args.loop_size,
+                'if_density': args.if_density,
+                'repeat': args.repeat
+            },
+            'stages': {}
+        }
+        for name in stages:
+            if args.stages and not name in args.stages:
+                continue
+            get_args, stage = stages[name]
+            results['stages'][name] = run_stage(get_args, stage, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # ru_maxrss is in kilobytes on linux
+    results['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print('{:24s} {:>8s} {:>12s} {:>14s} {:>12s}'.format('Stage', 'Items', 'Seconds', 'Items/s', 'Peak (KB)'))
+    for name in results['stages']:
+        r = results['stages'][name]
+        print('{:24s} {:8d} {:12.4f} {:14.1f} {:12d}'.format(name, r['items'], r['seconds'], r['items_per_second'], r['peak_kb']))
+    print(json.dumps(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for stage, before, after in regressions:
+            print('{} regressed from {:.4f}s to {:.4f}s'.format(stage, before, after))
+        if regressions:
+            exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Compare the pure python JSON and YAML backends against the fast ones picked
+by serializers.py (libyaml and orjson when they are installed)
+
+    python benchmarks/serializers.py [--objects 20] [--loop-size 200] [--repeat 5]
+
+Loading the config of a synthetic Compass as YAML and JSON, loading the
+rendered templates and writing out the manifests are timed separately, the
+outputs of both backends are checked to be equal. compose is then timed end
+to end with each backend
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wheel_house'))
+import compass_generator
+import serializers
+import template
+import utils
+from k8sgen.builder import K8sBuilder
+from wheel_house import WheelHouse
+
+def best_of(repeat, func, *args):
+    best = None
+    for r in range(0, repeat):
+        start = time.perf_counter()
+        out = func(*args)
+        elapsed = time.perf_counter() - start
+        if best == None or elapsed < best:
+            best = elapsed
+    return best, out
+
+def get_rendered(compass_path, config_data):
+    """ Render every template of the Compass, returning the text of each """
+    templates = template.TemplateCache()
+    rendered = []
+    for obj_dict in config_data['objects']:
+        obj = list(obj_dict.keys())[0]
+        for obj_type in obj_dict[obj]:
+            if not obj_type.startswith('__'):
+                rendered.append((obj_dict[obj], templates.get(compass_path, obj_type).render(utils.ConfigView(obj_dict[obj]))))
+    return rendered
+
+def load_all_json(texts):
+    return [serializers.load_json(t) for t in texts]
+
+def dump_all(dump, data):
+    return [dump(d) for d in data]
+
+def main():
+    parser = argparse.ArgumentParser(description='Serializer backend benchmark')
+    parser.add_argument('--objects', type=int, default=20)
+    parser.add_argument('--types', type=int, default=3)
+    parser.add_argument('--loop-size', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        compass_path = os.path.join(work_dir, 'compass')
+        config_path = compass_generator.make_compass(compass_path, args.objects, args.types, args.loop_size)
+        config_data = utils.read_file(config_path)
+        yaml_path = os.path.join(work_dir, 'config.yaml')
+        with open(yaml_path, 'w') as f:
+            yaml.safe_dump(config_data, f)
+
+        rendered = get_rendered(compass_path, config_data)
+        texts = [text for obj_data, text in rendered]
+        # the manifest data as k8sgen hands it to the YAML dumper
+        builder = K8sBuilder()
+        manifests = [builder.build_manifest(definition=json.loads(text), config=obj_data).to_json() for obj_data, text in rendered]
+
+        fast = serializers.get_backends()
+        stages = [
+            ('read_file yaml', lambda: utils.read_file(yaml_path)),
+            ('read_file json', lambda: utils.read_file(config_path)),
+            ('load rendered json', lambda: load_all_json(texts)),
+            ('dump manifests', lambda: dump_all(lambda d: yaml.dump(d, Dumper=serializers.YAML_DUMPER), manifests)),
+        ]
+        results = {'backends': {}, 'stages': {}}
+        outputs = {}
+        for backend in ['fast', 'pure']:
+            if backend == 'pure':
+                serializers.use_pure_python()
+            results['backends'][backend] = serializers.get_backends()
+            for name, func in stages:
+                seconds, out = best_of(args.repeat, func)
+                if name in outputs and outputs[name] != out:
+                    print('Output mismatch for {}'.format(name))
+                    exit(1)
+                outputs[name] = out
+                results['stages'].setdefault(name, {})[backend] = seconds
+
+            out_dir = os.path.join(work_dir, 'out-' + backend)
+            os.makedirs(out_dir)
+            wh = WheelHouse(parse_args=False)
+            seconds, count = best_of(args.repeat, wh.compose, compass_path, config_path, {'env': 'prod'}, 'NONE', 1, out_dir)
+            results['stages'].setdefault('compose', {})[backend] = seconds
+
+        # k8sgen's own dumper is what the manifests used to be written with
+        seconds, out = best_of(args.repeat, dump_all, yaml.dump, manifests)
+        if out != outputs['dump manifests']:
+            print('Output mismatch against k8sgen')
+            exit(1)
+        results['stages']['dump manifests']['k8sgen'] = seconds
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print('Fast backends: yaml={} json={}'.format(fast['yaml'], fast['json']))
+    print('{:20s} {:>12s} {:>12s} {:>10s}'.format('Stage', 'Pure (s)', 'Fast (s)', 'Speedup'))
+    for name in results['stages']:
+        r = results['stages'][name]
+        print('{:20s} {:12.4f} {:12.4f} {:9.1f}x'.format(name, r['pure'], r['fast'], r['pure'] / r['fast'] if r['fast'] else 0))
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark renders from the serve daemon against cold CLI runs for a synthetic Compass
+
+    python benchmarks/serve.py [--objects 2] [--types 3] [--requests 50] [--clients 1 4] [--output results.json]
+
+A cold run is a fresh `install -u -l -o -` process. The daemon is started
+once (its first request warms the template and config caches and isn't
+counted), then requests are sent from each number of clients at a time and
+the latency of each one is kept. The results are printed as a table
+followed by a line of JSON (and written to output if it is given)
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import compass_generator
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCRIPT = os.path.join(ROOT, 'wheel_house', 'wheel_house.py')
+ANSWERS = {'env': 'prod'}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def render(url, compass_path):
+    request = urllib.request.Request(url + '/render', data=json.dumps({'compass': compass_path, 'answers': ANSWERS}).encode())
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as r:
+        json.load(r)
+    return time.perf_counter() - start
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/health'):
+                return
+        except OSError:
+            time.sleep(0.05)
+    err = RuntimeError('The daemon did not start')
+    raise err
+
+def summarize(latencies, seconds):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'mean_seconds': sum(latencies) / len(latencies),
+        'p95_seconds': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'requests_per_second': len(latencies) / seconds
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Render daemon benchmarks')
+    parser.add_argument('--objects', type=int, default=2)
+    parser.add_argument('--types', type=int, default=3)
+    parser.add_argument('--loop-size', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--cold-runs', type=int, default=5)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--output', help='write the results to this file')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    daemon = None
+    try:
+        compass_path = os.path.join(work_dir, 'compass')
+        compass_generator.make_compass(compass_path, args.objects, args.types, args.loop_size)
+        answers_path = os.path.join(work_dir, 'answers.json')
+        with open(answers_path, 'w') as f:
+            json.dump(ANSWERS, f)
+        os.symlink(os.path.join(ROOT, 'data'), os.path.join(work_dir, 'data'))
+
+        results = {'params': {'objects': args.objects, 'types': args.types, 'loop_size': args.loop_size}, 'runs': {}}
+        command = [sys.executable, SCRIPT, 'install', '-n', compass_path, '-u', '-l', '-a', answers_path, '--log-level', 'NONE', '-o', '-']
+        latencies = []
+        start = time.perf_counter()
+        for r in range(0, args.cold_runs):
+            run_start = time.perf_counter()
+            subprocess.run(command, cwd=work_dir, stdout=subprocess.DEVNULL, check=True)
+            latencies.append(time.perf_counter() - run_start)
+        results['runs']['cold_cli'] = summarize(latencies, time.perf_counter() - start)
+
+        port = free_port()
+        url = 'http://127.0.0.1:{}'.format(port)
+        daemon = subprocess.Popen([sys.executable, SCRIPT, 'serve', '--port', str(port), '--log-level', 'NONE'], cwd=work_dir)
+        wait_for(url)
+        render(url, compass_path)
+        for clients in args.clients:
+            start = time.perf_counter()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=clients) as pool:
+                latencies = list(pool.map(lambda i: render(url, compass_path), range(0, args.requests)))
+            results['runs']['daemon_{}_clients'.format(clients)] = summarize(latencies, time.perf_counter() - start)
+    finally:
+        if daemon:
+            daemon.terminate()
+            daemon.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print('{:24s} {:>10s} {:>12s} {:>12s} {:>12s}'.format('Run', 'Requests', 'Mean (s)', 'p95 (s)', 'Requests/s'))
+    for name in results['runs']:
+        r = results['runs'][name]
+        print('{:24s} {:10d} {:12.4f} {:12.4f} {:12.1f}'.format(name, r['requests'], r['mean_seconds'], r['p95_seconds'], r['requests_per_second']))
+    print(json.dumps(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark how long the CLI takes to start for each subcommand
+
+    python benchmarks/startup.py [--repeat 5] [--top 5] [--output results.json]
+
+Each command is run in a fresh interpreter from a directory with the parser
+definition in it. The best wall time of repeat runs is kept, and a run with
+-X importtime gives the total import time and the slowest top level imports
+other than those the interpreter makes on its own. The results are printed as
+a table followed by a line of JSON (and written to output if it is given)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCRIPT = os.path.join(ROOT, 'wheel_house', 'wheel_house.py')
+
+# list and search are timed through their help, a real run is dominated by the API it talks to
+COMMANDS = {
+    'help': ['--help'],
+    'list_help': ['list', '--help'],
+    'search_help': ['search', '--help'],
+    'install_help': ['install', '--help'],
+    'watch_help': ['watch', '--help'],
+}
+
+def run(args, cwd, env=None):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=cwd, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+def get_imports(stderr, top, ignore=()):
+    """
+    Get the total import time and the slowest top level imports from -X
+    importtime output, leaving out the ignored modules
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented below the module that imported them
+        if name.startswith('  ') or name.strip() in ignore:
+            continue
+        imports.append((name.strip(), int(cumulative)))
+    imports.sort(key=lambda i: i[1], reverse=True)
+    return sum(i[1] for i in imports) / 1e6, [{'module': n, 'seconds': t / 1e6} for n, t in imports[:top]]
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI startup benchmarks')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--output', help='write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.symlink(os.path.join(ROOT, 'data'), os.path.join(work_dir, 'data'))
+        # keep the parser definition cache out of the real one, warmed up by the first run
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(work_dir, 'cache'))
+        run([SCRIPT, '--help'], work_dir, env)
+
+        baseline = min(run(['-c', 'pass'], work_dir)[0] for r in range(0, args.repeat))
+        # the modules every interpreter imports while starting up aren't counted
+        ignore = [i['module'] for i in get_imports(run(['-X', 'importtime', '-c', 'pass'], work_dir)[1].stderr, None)[1]]
+        results = {'params': {'repeat': args.repeat}, 'interpreter_seconds': baseline, 'commands': {}}
+        for name, command in COMMANDS.items():
+            best = min(run([SCRIPT] + command, work_dir, env)[0] for r in range(0, args.repeat))
+            imports, slowest = get_imports(run(['-X', 'importtime', SCRIPT] + command, work_dir, env)[1].stderr, args.top, ignore)
+            results['commands'][name] = {'seconds': best, 'import_seconds': imports, 'slowest_imports': slowest}
+
+    print('{:16s} {:>10s} {:>10s}  {}'.format('Command', 'Seconds', 'Imports', 'Slowest import'))
+    for name in results['commands']:
+        r = results['commands'][name]
+        slowest = r['slowest_imports'][0]['module'] if r['slowest_imports'] else ''
+        print('{:16s} {:10.4f} {:10.4f}  {}'.format(name, r['seconds'], r['import_seconds'], slowest))
+    print('{:16s} {:10.4f}'.format('python', results['interpreter_seconds']))
+    print(json.dumps(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == '__main__':
+    main()
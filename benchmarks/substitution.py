@@ -0,0 +1,79 @@
+"""
+Time filling in a loop block for each element of a list, comparing the
+re.sub per reference approach check_for_loops used to take with
+template.Substitution
+
+    python benchmarks/substitution.py [--sizes 10 1000 100000]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wheel_house'))
+import template
+import utils
+
+BLOCK = '''{
+    "name": "${item.__name__}",
+    "image": "${item.image}",
+    "port": "${item.ports.http}",
+    "env": "${item.env}",
+    "labels": {
+        "app": "${item.__name__}"
+    }
+},'''
+
+def make_elements(count):
+    return [{'element{}'.format(i): {'image': 'nginx:{}'.format(i), 'ports': {'http': 8000 + i}, 'env': {'INDEX': str(i)}}} for i in range(0, count)]
+
+def render_resub(var_name, block, elements):
+    out = []
+    for variable in elements:
+        variable_name = list(variable.keys())[0]
+        variable_data = variable[variable_name]
+        repeat_copy = re.sub('\$\{\s*' + var_name + '\.__name__\s*}', variable_name, block)
+        for el in re.findall('\$\{' + var_name + '\.(\S*)\}', repeat_copy):
+            item = utils.format_replacement(utils.get_from_key_list(variable_data, el.split('.')))
+            repeat_copy = re.sub('"\$\{' + var_name + '\.' + el + '}"', item, repeat_copy)
+        out.append(repeat_copy + '\n')
+    return ''.join(out)
+
+def render_substitution(var_name, block, elements):
+    substitution = template.Substitution(block, [var_name])
+    scope = template.Scope({})
+    out = []
+    for variable in elements:
+        variable_name = list(variable.keys())[0]
+        out.append(substitution.substitute(scope.bind(var_name, variable_name, variable[variable_name]).lookup) + '\n')
+    return ''.join(out)
+
+def time_it(func, *args):
+    start = time.perf_counter()
+    out = func(*args)
+    return time.perf_counter() - start, out
+
+def main():
+    parser = argparse.ArgumentParser(description='Loop substitution benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    args = parser.parse_args()
+
+    results = []
+    print('{:>10s} {:>14s} {:>18s} {:>10s}'.format('Elements', 're.sub (s)', 'Substitution (s)', 'Speedup'))
+    for size in args.sizes:
+        elements = make_elements(size)
+        resub_time, resub_out = time_it(render_resub, 'item', BLOCK, elements)
+        substitution_time, substitution_out = time_it(render_substitution, 'item', BLOCK, elements)
+        if resub_out != substitution_out:
+            print('Output mismatch for {} elements'.format(size))
+            exit(1)
+        speedup = resub_time / substitution_time if substitution_time else 0
+        print('{:10d} {:14.4f} {:18.4f} {:9.1f}x'.format(size, resub_time, substitution_time, speedup))
+        results.append({'elements': size, 'resub_seconds': resub_time, 'substitution_seconds': substitution_time})
+
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Compare the recursive resource definition walkers k8sgen ships with against
+the single pass walker in tree.py
+
+    python benchmarks/walkers.py [--nodes 10000] [--repeat 5] [--depth 3000]
+
+A synthetic CRD style document of about nodes nodes is filled in with
+elements, expanded, unset and cleaned the way a resource is turned into
+json, first with one recursive pass for each step and then with one
+iterative pass. The outputs are checked to be equal. A single chain depth
+nodes deep is then walked to check for the recursion limit
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wheel_house'))
+import utils
+from k8sgen import utils as k8sgen_utils
+
+class Metadata:
+    """ Stand in for a k8sgen component """
+    def __init__(self, name):
+        self.name = name
+
+    def to_json(self):
+        return {'name': self.name, 'labels': {'app': self.name}}
+
+COMPONENTS = ['Metadata']
+
+def make_document(nodes):
+    """ Build a document of nested versions of a CRD schema along with elements to fill into it """
+    doc = {'apiVersion': 'example.com/v1', 'kind': 'Example', 'metadata': '<COMPONENT.Metadata>', 'spec': {}}
+    elements = {'metadata': Metadata('example')}
+    count = 0
+    v = 0
+    while count < nodes:
+        version = {
+            'name': '<string>',
+            'served': '<boolean>',
+            'schema': {
+                'openAPIV3Schema': {
+                    'type': 'object',
+                    'properties': {
+                        'replicas': {'type': '<integer>', 'default': None},
+                        'selector': '<COMPONENT.Metadata>',
+                        'containers': [{'name': '<string>', 'ports': [{'containerPort': '<integer>'}, {}]}]
+                    },
+                    'required': []
+                }
+            },
+            'additionalPrinterColumns': [{'name': 'Age', 'jsonPath': '.metadata.creationTimestamp'}, None, '']
+        }
+        doc['spec']['version{}'.format(v)] = version
+        elements['spec.version{}.name'.format(v)] = 'v{}'.format(v)
+        elements['spec.version{}.schema.openAPIV3Schema.properties.selector'.format(v)] = Metadata('selector{}'.format(v))
+        count += 20
+        v += 1
+    return doc, elements
+
+def old_build(data, elements):
+    data = k8sgen_utils.recurse_build(data, [], elements)
+    data = k8sgen_utils.recurse_expand(data, COMPONENTS)
+    return k8sgen_utils.clean_null(data)
+
+def new_passes(data, elements):
+    data = utils.recurse_build(data, [], elements)
+    data = utils.recurse_expand(data, COMPONENTS)
+    return utils.clean_null(data)
+
+def new_build(data, elements):
+    return utils.build_json(data, elements, COMPONENTS)
+
+def time_it(func, doc, elements, repeat):
+    best = None
+    out = None
+    for r in range(0, repeat):
+        data = copy.deepcopy(doc)
+        start = time.perf_counter()
+        out = func(data, elements)
+        elapsed = time.perf_counter() - start
+        if best == None or elapsed < best:
+            best = elapsed
+    return best, out
+
+def walks_deep(func, depth):
+    doc = {}
+    node = doc
+    for d in range(0, depth):
+        node['child'] = {'value': '<string>', 'keep': d + 1}
+        node = node['child']
+    try:
+        func(doc, {})
+        return True
+    except RecursionError:
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description='Tree walker benchmark')
+    parser.add_argument('--nodes', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--depth', type=int, default=3000)
+    args = parser.parse_args()
+
+    doc, elements = make_document(args.nodes)
+    results = {'nodes': args.nodes, 'depth': args.depth, 'walkers': {}}
+    expected = None
+    print('{:28s} {:>12s} {:>16s}'.format('Walker', 'Seconds', 'Depth {} ok'.format(args.depth)))
+    for name, func in [('recursive (k8sgen)', old_build), ('iterative, one per step', new_passes), ('iterative, single pass', new_build)]:
+        seconds, out = time_it(func, doc, elements, args.repeat)
+        if expected == None:
+            expected = out
+        elif out != expected:
+            print('Output mismatch for {}'.format(name))
+            exit(1)
+        deep = walks_deep(func, args.depth)
+        print('{:28s} {:12.4f} {:>16s}'.format(name, seconds, str(deep)))
+        results['walkers'][name] = {'seconds': seconds, 'deep': deep}
+
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import http.server
+import json
+import os
+import sys
+import threading
+import pytest
+
+# the modules import each other by name from the wheel_house directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wheel_house'))
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        responses = self.server.routes.get(self.path)
+        if not responses:
+            self.send_error(404)
+            return
+        # each response is used once, apart from the last which keeps being sent
+        status, headers, body = responses.pop(0) if len(responses) > 1 else responses[0]
+        if type(body) != bytes:
+            body = json.dumps(body).encode()
+        if status == 304:
+            body = b''
+        self.send_response(status)
+        for k in headers:
+            self.send_header(k, headers[k])
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        """ Local stand in for the frontend API, routes maps a path to the (status, headers, body) responses to send for it """
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.routes = {}
+        self.requests = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def add(self, path, body, status=200, headers={}):
+        self.routes.setdefault(path, []).append((status, headers, body))
+
+    def paths(self):
+        return [r[0] for r in self.requests]
+
+
+@pytest.fixture
+def api():
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """ Keep the package and response caches in a temp dir """
+    path = tmp_path / 'cache'
+    monkeypatch.setenv('XDG_CACHE_HOME', str(path))
+    return path / 'wheelhouse'
+
+CONFIGMAP_TEMPLATE = '''{
+    "components": {
+        "meta": {
+            "type": "Components.Metadata",
+            "fields": {
+                "name": "${config.__settings__.name}"
+            }
+        },
+        "cm": {
+            "type": "APIResources.ConfigMap",
+            "fields": {
+                "metadata": "${.meta}",
+                "data": {
+                    // {% for item in obj.configmap.items %}
+                    "${item.__name__}": "${item.v}",
+                    // {% end for %}
+                    // {% if obj.__settings__.env == "prod" %}
+                    "prod": "true",
+                    // {% end if %}
+                    "end": "x"
+                }
+            }
+        }
+    },
+    "return": "cm"
+}
+'''
+
+def make_compass(path, objects=('app', 'other')):
+    """ Write out a small Compass with a configmap for each object, returning its path """
+    os.makedirs(os.path.join(path, 'templates', 'configmap'))
+    with open(os.path.join(path, 'templates', 'configmap', 'template.json'), 'w') as f:
+        f.write(CONFIGMAP_TEMPLATE)
+    config = {'objects': [{obj: {
+        '__settings__': {'name': obj + '-config', 'env': '${var.env|dev}'},
+        'configmap': {'items': [{'alpha': {'v': '1'}}, {'beta': {'v': '2'}}]}
+    }} for obj in objects]}
+    with open(os.path.join(path, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=4)
+    with open(os.path.join(path, 'interactive.yaml'), 'w') as f:
+        f.write('- prompt: "Environment: "\n  variable: env\n')
+    return str(path)
+
+@pytest.fixture
+def compass(tmp_path):
+    return make_compass(tmp_path / 'compass')
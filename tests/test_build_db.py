@@ -0,0 +1,78 @@
+import json
+import os
+import build_db
+from wheel_house import WheelHouse
+
+
+def write(path, text='x'):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def test_first_build_leaves_other_files(tmp_path):
+    write(tmp_path / 'README.md')
+    write(tmp_path / 'app-configmap.yaml')
+    builds = build_db.BuildDatabase(str(tmp_path))
+    assert builds.remove_stale({'app-configmap.yaml': 'key'}) == []
+    assert sorted(os.listdir(tmp_path)) == ['README.md', 'app-configmap.yaml']
+
+def test_removes_only_recorded_outputs(tmp_path):
+    write(tmp_path / 'notes.txt')
+    write(tmp_path / 'app-configmap.yaml')
+    write(tmp_path / 'old-configmap.yaml')
+    builds = build_db.BuildDatabase(str(tmp_path))
+    builds.record('app-configmap.yaml', 'key')
+    builds.record('old-configmap.yaml', 'key')
+    builds.save()
+
+    builds = build_db.BuildDatabase(str(tmp_path))
+    assert builds.remove_stale({'app-configmap.yaml': 'key'}) == ['old-configmap.yaml']
+    assert sorted(os.listdir(tmp_path)) == [build_db.BUILD_DB_FILE, 'app-configmap.yaml', 'notes.txt']
+    assert list(builds.outputs) == ['app-configmap.yaml']
+
+def test_clear_leaves_other_files(tmp_path):
+    write(tmp_path / 'notes.txt')
+    write(tmp_path / 'app-configmap.yaml')
+    builds = build_db.BuildDatabase(str(tmp_path))
+    builds.record('app-configmap.yaml', 'key')
+    builds.record('../outside.yaml', 'key')
+    assert builds.clear() == ['app-configmap.yaml']
+    assert os.listdir(tmp_path) == ['notes.txt']
+    assert builds.outputs == {}
+
+FILE_TEMPLATE = '''{
+    "components": {
+        "meta": {"type": "Components.Metadata", "fields": {"name": "${config.__settings__.name}"}},
+        "cm": {"type": "APIResources.ConfigMap", "fields": {"metadata": "${.meta}", "data": {"file": "${file.PATH}"}}}
+    },
+    "return": "cm"
+}
+'''
+
+def test_files_read_are_always_rebuilt(compass, tmp_path):
+    data_path = tmp_path / 'data.txt'
+    write(data_path, 'first')
+    os.makedirs(os.path.join(compass, 'templates', 'filemap'))
+    write(os.path.join(compass, 'templates', 'filemap', 'template.json'), FILE_TEMPLATE.replace('PATH', str(data_path)))
+    config_path = os.path.join(compass, 'config.json')
+    with open(config_path) as f:
+        config = json.load(f)
+    config['objects'][0]['app']['filemap'] = {}
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+
+    out_dir = str(tmp_path / 'out')
+    def build():
+        wh = WheelHouse(parse_args=False)
+        timings = []
+        wh.compose(compass, config_path, {}, 'NONE', out_dir=out_dir, builds=build_db.BuildDatabase(out_dir), timings=timings)
+        with open(os.path.join(out_dir, 'app-filemap.yaml')) as f:
+            return sorted((obj, obj_type) for obj, obj_type, seconds in timings), f.read()
+    rendered, manifest = build()
+    assert rendered == [('app', 'configmap'), ('app', 'filemap'), ('other', 'configmap')]
+    assert 'file: first' in manifest
+
+    write(data_path, 'second')
+    rendered, manifest = build()
+    # only the manifest reading the file is built again
+    assert rendered == [('app', 'filemap')]
+    assert 'file: second' in manifest
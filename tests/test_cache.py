@@ -0,0 +1,107 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import tarfile
+import pytest
+import cache
+from wheel_house import WheelHouse
+
+INFO_PATH = '/api/getCompassURLByNameAndVersion/app/1.0.0'
+ANSWERS = {'env': 'prod'}
+
+
+def make_package(compass):
+    """ Pack a Compass directory into the bytes of a .tar.gz the way the API serves them """
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w:gz') as tar:
+        for name in sorted(os.listdir(compass)):
+            tar.add(os.path.join(compass, name), arcname=name)
+    return data.getvalue()
+
+def serve_package(api, compass, sha256=None):
+    package = make_package(compass)
+    api.add(INFO_PATH, {'url': api.url + '/packages/app.tar.gz', 'sha256': sha256 or hashlib.sha256(package).hexdigest()})
+    api.add('/packages/app.tar.gz', package, headers={'Content-Type': 'application/gzip'})
+    return package
+
+def install(api, out_dir, **kwargs):
+    return WheelHouse(parse_args=False).install_compass('app', '1.0.0', api_url=api.url, log_level='NONE', out_dir=str(out_dir),
+                                                        answers=ANSWERS, **kwargs)
+
+def read_dir(path):
+    return {name: open(os.path.join(path, name)).read() for name in os.listdir(path) if name.endswith('.yaml')}
+
+def test_installs_download_once(api, cache_dir, compass, tmp_path):
+    package = serve_package(api, compass)
+    assert install(api, tmp_path / 'first') == 2
+    assert api.paths() == [INFO_PATH, '/packages/app.tar.gz']
+    # the second install is served from the cache without a request
+    assert install(api, tmp_path / 'second') == 2
+    assert len(api.requests) == 2
+    assert read_dir(tmp_path / 'first') == read_dir(tmp_path / 'second')
+    entries = cache.CompassCache().list()
+    assert [(e['name'], e['version'], e['hash']) for e in entries] == [('app', '1.0.0', hashlib.sha256(package).hexdigest())]
+    assert sorted(os.listdir(cache_dir / 'compasses' / entries[0]['hash'])) == ['config.json', 'interactive.yaml', 'templates']
+
+def test_offline_install_from_cache(api, cache_dir, compass, tmp_path):
+    serve_package(api, compass)
+    install(api, tmp_path / 'first')
+    api.routes.clear()
+    assert install(api, tmp_path / 'second', offline=True) == 2
+    assert len(api.requests) == 2
+
+def test_offline_install_without_cache(api, cache_dir, compass, tmp_path):
+    serve_package(api, compass)
+    with pytest.raises(SystemExit):
+        install(api, tmp_path / 'out', offline=True)
+    assert api.requests == []
+
+def test_checksum_mismatch_is_not_cached(api, cache_dir, compass, tmp_path):
+    serve_package(api, compass, sha256='0' * 64)
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        install(api, tmp_path / 'out')
+    assert cache.CompassCache().list() == []
+    # nothing is left behind from the extraction
+    assert os.listdir(cache_dir / 'compasses') == []
+    assert sorted(os.listdir(cache_dir)) == ['compasses', 'index.lock', 'responses']
+
+def test_prune_least_recently_used(tmp_path, compass):
+    compass_cache = cache.CompassCache(str(tmp_path / 'cache'))
+    for version, digest in [('1.0.0', 'a' * 64), ('2.0.0', 'b' * 64), ('3.0.0', 'a' * 64)]:
+        path = compass_cache.temp_dir()
+        with tarfile.open(fileobj=io.BytesIO(make_package(compass)), mode='r:gz') as tar:
+            tar.extractall(path)
+        compass_cache.add('app', version, digest, path)
+    size = compass_cache.list()[0]['size']
+    # 1.0.0 and 3.0.0 share a package, so it is only removed once neither uses it
+    compass_cache.get('app', '3.0.0')
+    removed = compass_cache.prune(max_size=size)
+    assert [e['version'] for e in removed] == ['1.0.0', '2.0.0']
+    assert [e['version'] for e in compass_cache.list()] == ['3.0.0']
+    assert sorted(os.listdir(os.path.join(compass_cache.path, 'compasses'))) == ['a' * 64]
+    assert compass_cache.get('app', '1.0.0') == None
+
+def add_versions(path, package, versions):
+    compass_cache = cache.CompassCache(path)
+    for version in versions:
+        temp_path = compass_cache.temp_dir()
+        with tarfile.open(fileobj=io.BytesIO(package), mode='r:gz') as tar:
+            tar.extractall(temp_path)
+        compass_cache.add('app', version, hashlib.sha256(version.encode()).hexdigest(), temp_path)
+        compass_cache.get('app', version)
+
+@pytest.mark.parametrize('worker', [threading.Thread, multiprocessing.get_context('fork').Process])
+def test_concurrent_adds_keep_every_entry(tmp_path, compass, worker):
+    # threads share the process lock and processes take the file lock, either way no update to the index is lost
+    path = str(tmp_path / 'cache')
+    package = make_package(compass)
+    workers = [worker(target=add_versions, args=(path, package, ['{}.{}.0'.format(i, j) for j in range(10)])) for i in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    entries = cache.CompassCache(path).list()
+    assert len(entries) == 40
+    assert len(os.listdir(os.path.join(path, 'compasses'))) == 40
@@ -0,0 +1,83 @@
+import shutil
+import sys
+import types
+import pytest
+import requests
+import urllib3.util.retry
+import cache
+from client import CompassClient
+from wheel_house import WheelHouse
+
+PATH = '/api/getCompassObjectsByName/app'
+VERSIONS = {'compasses': [{'name': 'app', 'version': '1.0.0'}]}
+
+
+def make_client(api, tmp_path, **kwargs):
+    return CompassClient(api.url, backoff=0, responses=cache.ResponseCache(str(tmp_path)), **kwargs)
+
+def test_retries_server_errors(api, tmp_path):
+    api.add(PATH, {}, status=503)
+    api.add(PATH, {}, status=502)
+    api.add(PATH, VERSIONS)
+    assert make_client(api, tmp_path).get_compasses('app') == VERSIONS
+    assert api.paths() == [PATH] * 3
+
+def test_gives_up_after_retries(api, tmp_path):
+    api.add(PATH, {}, status=503)
+    with pytest.raises(requests.HTTPError):
+        make_client(api, tmp_path, retries=2).get_compasses('app')
+    assert len(api.requests) == 3
+
+def test_not_found_is_not_retried(api, tmp_path):
+    with pytest.raises(requests.HTTPError):
+        make_client(api, tmp_path).get_compasses('missing')
+    assert len(api.requests) == 1
+
+def test_revalidates_with_etag(api, tmp_path):
+    api.add(PATH, VERSIONS, headers={'ETag': '"v1"'})
+    api.add(PATH, {}, status=304, headers={'ETag': '"v1"'})
+    assert make_client(api, tmp_path).get_compasses('app') == VERSIONS
+    # a new client only has the cached copy on disk
+    assert make_client(api, tmp_path).get_compasses('app') == VERSIONS
+    assert api.requests[1][1].get('If-None-Match') == '"v1"'
+
+def test_ttl_skips_the_request(api, tmp_path):
+    api.add(PATH, VERSIONS)
+    assert make_client(api, tmp_path, ttl=60).get_compasses('app') == VERSIONS
+    # the API is gone, the cached response is used without asking it
+    api.routes.clear()
+    assert make_client(api, tmp_path, ttl=60).get_compasses('app') == VERSIONS
+    assert len(api.requests) == 1
+
+def test_older_urllib3(api, tmp_path, monkeypatch):
+    Retry = urllib3.util.retry.Retry
+    def old_retry(method_whitelist=None, **kwargs):
+        if 'allowed_methods' in kwargs:
+            raise TypeError("__init__() got an unexpected keyword argument 'allowed_methods'")
+        return Retry(allowed_methods=method_whitelist, **kwargs)
+    # the client imports Retry when it is created, urllib3 keeps its own reference
+    monkeypatch.setitem(sys.modules, 'urllib3.util.retry', types.SimpleNamespace(Retry=old_retry))
+    api.add(PATH, {}, status=503)
+    api.add(PATH, VERSIONS)
+    assert make_client(api, tmp_path).get_compasses('app') == VERSIONS
+    assert len(api.requests) == 2
+
+def test_download_retries(api, tmp_path):
+    api.add('/packages/app.tar.gz', b'', status=503)
+    api.add('/packages/app.tar.gz', b'package')
+    with make_client(api, tmp_path).stream(api.url + '/packages/app.tar.gz') as r:
+        assert b''.join(r.iter_content(chunk_size=4)) == b'package'
+    assert len(api.requests) == 2
+
+def test_cached_compass_needs_no_client(cache_dir, compass):
+    compass_cache = cache.CompassCache()
+    path = compass_cache.temp_dir()
+    shutil.rmtree(path)
+    shutil.copytree(compass, path)
+    cached = compass_cache.add('app', '1.0.0', 'a' * 64, path)
+    wh = WheelHouse(parse_args=False)
+    wh.set_log_level('NONE')
+    # no API is running, and none is needed
+    assert wh.get_compass('app', '1.0.0', api_url='http://127.0.0.1:9') == cached
+    assert wh.get_compass('app', '1.0.0', offline=True) == cached
+    assert wh.client == None
@@ -0,0 +1,46 @@
+import argparse
+import json
+import threading
+import pytest
+import utils
+from wheel_house import WheelHouse
+
+
+def lookup_args(api, names, **kwargs):
+    args = dict(name=names, names_file=None, concurrency='4', api_url=api.url, cache_ttl='0', json=True, log_level='NONE')
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+def test_fetch_many_runs_concurrently():
+    # every fetch waits for the others, so this only finishes if they all run at once
+    barrier = threading.Barrier(3, timeout=5)
+    def fetch(name):
+        barrier.wait()
+        return name.upper()
+    results = sorted(utils.fetch_many(fetch, ['a', 'b', 'c'], concurrency=3))
+    assert results == [('a', 'A', None), ('b', 'B', None), ('c', 'C', None)]
+
+def test_fetch_many_reports_errors():
+    def fetch(name):
+        if name == 'bad':
+            raise ValueError('no ' + name)
+        return name
+    results = list(utils.fetch_many(fetch, ['good', 'bad']))
+    assert results == [('good', 'good', None), ('bad', None, 'ValueError: no bad')]
+
+def test_list_many_names(api, cache_dir, capsys):
+    for name in ['app', 'db']:
+        api.add('/api/getCompassObjectsByName/' + name, {'compasses': [{'name': name, 'version': '1.0.0'}]})
+    WheelHouse(parse_args=False).list_compasses(lookup_args(api, ['app', 'db', 'app']))
+    lines = [json.loads(l) for l in capsys.readouterr().out.splitlines()]
+    assert sorted(l['name'] for l in lines) == ['app', 'db']
+    assert all(l['data']['compasses'][0]['name'] == l['name'] for l in lines)
+
+def test_search_with_a_failure(api, cache_dir, capsys):
+    api.add('/api/getCompassObjectsByFuzzyName/app', {'matches': ['app', 'apple']})
+    with pytest.raises(SystemExit):
+        WheelHouse(parse_args=False).search_compasses(lookup_args(api, ['app', 'missing']))
+    lines = {l['name']: l for l in map(json.loads, capsys.readouterr().out.splitlines())}
+    assert lines['app']['data'] == {'matches': ['app', 'apple']}
+    assert lines['missing']['error'].startswith('HTTPError: 404')
+    assert sorted(api.paths()) == ['/api/getCompassObjectsByFuzzyName/app', '/api/getCompassObjectsByFuzzyName/missing']
@@ -0,0 +1,60 @@
+import json
+import pytest
+import manifest_builder
+import utils
+from k8sgen import APIResources, builder
+from k8sgen import utils as k8sgen_utils
+
+DEFINITION = {
+    'components': {
+        'meta': {'type': 'Components.Metadata', 'fields': {'name': '${config.name}', 'labels': {'app': 'web'}}},
+        'cm': {'type': 'APIResources.ConfigMap', 'fields': {'metadata': '${.meta}', 'data': {'a': '1'}}}
+    },
+    'return': 'cm'
+}
+
+def test_key_string_matches_k8sgen():
+    fields = APIResources.Deployment().fields()
+    assert utils.get_key_string(fields) == k8sgen_utils.get_key_string(fields)
+
+@pytest.mark.parametrize('name', ['Deployment', 'ConfigMap', 'CustomResourceDefinition', 'Service'])
+def test_set_fields_matches_k8sgen(name):
+    keys = k8sgen_utils.get_key_string(getattr(APIResources, name)().fields())
+    kwargs = {'_' + k.replace('.', '_'): i for i, k in enumerate(keys)}
+    # suffixes, which may be ambiguous, along with names which don't exist
+    kwargs.update({k.split('.')[-1]: 'last' for k in keys})
+    kwargs.update({'_missing': 1, 'missing': 2})
+    expected = getattr(APIResources, name)()
+    obj = getattr(APIResources, name)()
+    assert manifest_builder.set_fields(obj, **kwargs) == expected.set(**kwargs)
+    assert obj.elements == expected.elements
+
+def test_builds_the_same_manifest():
+    expected = builder.K8sBuilder().build_manifest(definition=json.loads(json.dumps(DEFINITION)), config={'name': 'app'})
+    out = manifest_builder.ManifestBuilder().build_manifest(definition=json.loads(json.dumps(DEFINITION)), config={'name': 'app'})
+    assert utils.to_json(out) == expected.to_json()
+    assert out.to_json()['metadata'] == {'name': 'app', 'labels': {'app': 'web'}}
+
+def test_path_index_keeps_keys_named_like_loop_keywords():
+    config = {'ports': {'http': 80, 'https': 443}, 'meta': {'__keys__': 'real'}}
+    index = utils.PathIndex(config)
+    assert index.get(['meta', '__keys__']) == 'real'
+    assert index.get(['ports', '__keys__']) == None
+    assert len(index.paths) == 6
+
+def test_config_view_refs_only_copy_the_value(monkeypatch):
+    definition = json.loads(json.dumps(DEFINITION))
+    definition['components']['cm']['fields']['data'] = {'a': '${config.__settings__.small}', 'env': '${config.__settings__.env}'}
+    settings = {'small': {'k': 'v'}, 'env': {'A': 1}, 'big': [{'x': i} for i in range(0, 1000)]}
+    config = {'name': 'app', '__settings__': settings}
+    expected = builder.K8sBuilder().build_manifest(definition=json.loads(json.dumps(definition)), config=json.loads(json.dumps(config)))
+    view = utils.ConfigView(config, index=utils.PathIndex(config))
+    # reading through the mapping interface would copy all of the settings
+    def no_copy(self, key):
+        raise AssertionError('{} was copied'.format(key))
+    monkeypatch.setattr(utils.ConfigView, '__getitem__', no_copy)
+    out = manifest_builder.ManifestBuilder().build_manifest(definition=definition, config=view)
+    assert utils.to_json(out) == expected.to_json()
+    # the resolved values were copied, the config is left as it was
+    out.elements['data']['a']['k'] = 'changed'
+    assert settings['small'] == {'k': 'v'}
@@ -0,0 +1,73 @@
+import json
+import os
+import memo
+import utils
+from wheel_house import WheelHouse
+
+NAMED_TEMPLATE = '''{
+    "components": {
+        "meta": {
+            "type": "Components.Metadata",
+            "fields": {
+                "name": "${config.__this__.__name__}",
+                "labels": {"app": "a", "value": "${config.__this__.value}"}
+            }
+        },
+        "cm": {
+            "type": "APIResources.ConfigMap",
+            "fields": {
+                "metadata": "${.meta}",
+                "data": {"a": "a-data", "value": "${config.__this__.value}"}
+            }
+        }
+    },
+    "return": "cm"
+}
+'''
+
+def make_named_compass(path, elements):
+    """ A Compass with a list component named after each of its elements """
+    os.makedirs(os.path.join(path, 'templates', 'named'))
+    with open(os.path.join(path, 'templates', 'named', 'template.json'), 'w') as f:
+        f.write(NAMED_TEMPLATE)
+    config = {'objects': [{'app': {'named': [{name: {'value': value}} for name, value in elements]}}]}
+    with open(os.path.join(path, 'config.json'), 'w') as f:
+        json.dump(config, f)
+    return str(path)
+
+def get_key(name, value):
+    definition = json.loads(NAMED_TEMPLATE)
+    obj_data = utils.ConfigView({'__this__': {'__name__': name, 'value': value}})
+    return memo.RenderMemo().get_key(NAMED_TEMPLATE, definition, obj_data, name)
+
+def test_short_names_share_a_key():
+    key, generic = get_key('a', 'x')
+    assert generic != None
+    # the a of the label and the data isn't the name, whatever the element is called
+    assert get_key('b', 'x')[0] == key
+    assert get_key('web', 'x')[0] == key
+
+def test_values_equal_to_the_name():
+    # the value of a is its own name, so it is generalised along with it
+    assert get_key('a', 'a')[0] == get_key('b', 'b')[0]
+    assert get_key('a', 'a')[0] != get_key('b', 'a')[0]
+    assert get_key('a', 'x')[0] != get_key('b', 'a')[0]
+
+def test_renders_match_without_memo(tmp_path):
+    elements = [(name, 'a') for name in ['a', 'b', 'c', '1', 'meta', 'data', 'value']] + [('web-{}'.format(i), 'x') for i in range(0, 20)]
+    compass = make_named_compass(tmp_path / 'compass', elements)
+    wh = WheelHouse(parse_args=False)
+    memoized = list(wh.render(compass))
+    assert wh.memo.misses == 3
+    assert wh.memo.hits == len(elements) - 3
+    unmemoized = WheelHouse(parse_args=False)
+    unmemoized.memo = memo.RenderMemo(0)
+    assert list(unmemoized.render(compass)) == memoized
+    assert 'name: a\n' in memoized[0][2]
+
+def test_small_compose_skips_memo(tmp_path):
+    compass = make_named_compass(tmp_path / 'compass', [('a', 'a'), ('b', 'a')])
+    wh = WheelHouse(parse_args=False)
+    config_path = os.path.join(compass, 'config.json')
+    assert wh.compose(compass, config_path, {}, 'NONE', out_dir=str(tmp_path / 'out')) == 2
+    assert (wh.memo.hits, wh.memo.misses) == (0, 0)
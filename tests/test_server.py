@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+import urllib.request
+import urllib.error
+import pytest
+import manifest_builder
+import memo
+import server
+import template
+import variables
+from wheel_house import WheelHouse
+
+
+@pytest.fixture
+def service():
+    """ A render service on localhost with two renderers set up the way serve does it """
+    templates = template.TemplateCache()
+    configs = variables.ConfigCache()
+    render_memo = memo.RenderMemo()
+    renderers = []
+    for i in range(0, 2):
+        renderer = WheelHouse(parse_args=False)
+        renderer.builder = manifest_builder.ManifestBuilder()
+        renderer.templates = templates
+        renderer.configs = configs
+        renderer.memo = render_memo
+        renderers.append(renderer)
+    service = server.RenderService(renderers, log_level='NONE')
+    httpd = server.RenderHTTPServer(('127.0.0.1', 0), service)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    service.url = 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    yield service
+    httpd.shutdown()
+    httpd.server_close()
+
+def post(service, body):
+    data = body if type(body) == bytes else json.dumps(body).encode()
+    try:
+        with urllib.request.urlopen(service.url + '/render', data=data) as r:
+            return r.status, json.load(r)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+def test_render(service, compass):
+    status, result = post(service, {'compass': compass, 'answers': {'env': 'prod'}})
+    assert status == 200
+    assert result['count'] == 2
+    assert "prod: 'true'" in result['manifests']
+    assert 'name: other-config' in result['manifests']
+
+def test_render_objects(service, compass):
+    status, result = post(service, {'compass': compass, 'objects': ['other']})
+    assert status == 200
+    assert result['count'] == 1
+    assert not 'app-config' in result['manifests']
+
+def test_bad_requests(service, compass, tmp_path):
+    empty = tmp_path / 'empty'
+    empty.mkdir()
+    for body in [b'{', [], {'answers': {}}, {'compass': str(tmp_path / 'missing')}, {'compass': str(empty)},
+                 {'compass': compass, 'answers': {'nope': 1}}]:
+        status, result = post(service, body)
+        assert status == 400, body
+        assert result['error']
+    # bad requests aren't failed renders
+    assert service.get_stats()['failures'] == 0
+
+def test_failed_render(service, compass):
+    with open(os.path.join(compass, 'templates', 'configmap', 'template.json'), 'w') as f:
+        f.write('{"components": {')
+    status, result = post(service, {'compass': compass})
+    assert status == 500
+    assert service.get_stats()['failures'] == 1
+
+def test_health(service, compass):
+    post(service, {'compass': compass})
+    with urllib.request.urlopen(service.url + '/health') as r:
+        stats = json.load(r)
+    assert stats['renders'] == 1
+    assert stats['configs'] == 1
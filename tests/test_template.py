@@ -0,0 +1,92 @@
+import json
+import os
+import yaml
+import manifest_builder
+import template
+import utils
+from wheel_house import WheelHouse
+
+TEMPLATE = '''{
+    "data": {
+        // {% for item in obj.items %}
+        "${item.__name__}": VALUE,
+        // {% end for %}
+        "end": "x"
+    }
+}'''
+
+OBJ_DATA = {'items': [{'first': {'a': 'one', 'b': {'c': 2}}}]}
+
+def render(value):
+    text = template.compile_template(TEMPLATE.replace('VALUE', value)).render(utils.ConfigView(OBJ_DATA))
+    return json.loads(text)['data']['first']
+
+def test_placeholder():
+    assert render('"${item.a}"') == 'one'
+    assert render('"${item.b}"') == {'c': 2}
+    assert render('"${item.b.c}"') == 2
+
+def test_two_placeholders_in_one_string():
+    assert render('"${item.a}-${item.b}"') == '${item.a}-${item.b}'
+
+def test_name_in_a_string():
+    assert render('"${item.__name__}-${item.a}"') == 'first-${item.a}'
+
+IF_TEMPLATE = '''{
+    // {% if obj.count OP 2 %}
+    "kept": true,
+    // {% end if %}
+    "end": "x"
+}'''
+
+def test_comparisons():
+    results = {}
+    for op in ['<', '<=', '==', '>=', '>', '!=']:
+        for count in [1, 2, 3]:
+            text = template.compile_template(IF_TEMPLATE.replace('OP', op)).render(utils.ConfigView({'count': count}))
+            results[(op, count)] = 'kept' in text
+    assert [results[('<=', c)] for c in [1, 2, 3]] == [True, True, False]
+    assert [results[('>=', c)] for c in [1, 2, 3]] == [False, True, True]
+    assert [results[('<', c)] for c in [1, 2, 3]] == [True, False, False]
+    assert [results[('>', c)] for c in [1, 2, 3]] == [False, False, True]
+    assert [results[('==', c)] for c in [1, 2, 3]] == [False, True, False]
+    assert [results[('!=', c)] for c in [1, 2, 3]] == [True, False, True]
+
+LOOP_TEMPLATE = '''{
+    "components": {
+        "meta": {"type": "Components.Metadata", "fields": {"name": "loops"}},
+        "cm": {
+            "type": "APIResources.ConfigMap",
+            "fields": {
+                "metadata": "${.meta}",
+                "data": {
+                    // {% for item in obj.items %}
+                    "${item.__name__}": "${item.v}",
+                    "${item.__name__}-brace": "{${item.v}}",
+                    // {% for port in obj.ports %}
+                    "${item.__name__}-${port.__name__}": "${port.number}",
+                    // {% end for %}
+                    // {% end for %}
+                }
+            }
+        }
+    },
+    "return": "cm"
+}'''
+
+def test_loops_through_render_obj(tmp_path):
+    os.makedirs(tmp_path / 'templates' / 'loops')
+    (tmp_path / 'templates' / 'loops' / 'template.json').write_text(LOOP_TEMPLATE)
+    obj_data = {
+        'items': [{'a': {'v': 'one'}}, {'b': {'v': 'two'}}],
+        'ports': [{'http': {'number': '80'}}, {'https': {'number': '443'}}]
+    }
+    wh = WheelHouse(parse_args=False)
+    wh.set_log_level('NONE')
+    wh.builder = manifest_builder.ManifestBuilder()
+    wh.templates = template.TemplateCache()
+    debug, manifest = wh.render_obj('app', obj_data, 'loops', str(tmp_path))
+    assert yaml.safe_load(manifest)['data'] == {
+        'a': 'one', 'a-brace': '{${item.v}}', 'a-http': '80', 'a-https': '443',
+        'b': 'two', 'b-brace': '{${item.v}}', 'b-http': '80', 'b-https': '443'
+    }
@@ -0,0 +1,44 @@
+import copy
+import pytest
+import utils
+from k8sgen import APIResources, Components
+
+
+def check_to_json(obj):
+    # k8sgen's to_json fills in the values it was given in place, so each gets its own copy
+    assert utils.to_json(copy.deepcopy(obj)) == copy.deepcopy(obj).to_json()
+
+def test_to_json_matches_k8sgen():
+    meta = Components.Metadata()
+    assert meta.set(name='app', labels={'app': 'web', 'empty': '', 'unset': '<unset>'}) == [True] * 2
+    cm = APIResources.ConfigMap()
+    assert cm.set(metadata=meta, _data={'a': '1', 'b': None, 'c': {}, 'd': [None, {}, [None], 'x']}) == [True] * 2
+    check_to_json(cm)
+    assert utils.to_json(cm) == {
+        'apiVersion': 'v1',
+        'kind': 'ConfigMap',
+        'metadata': {'name': 'app', 'labels': {'app': 'web'}},
+        'data': {'a': '1', 'd': [[None], 'x']}
+    }
+
+def test_to_json_nested_components():
+    container = Components.Container()
+    assert container.set(_name='web', image='nginx', ports=[{'containerPort': 80}, {}]) == [True] * 3
+    spec = Components.ContainerSpec()
+    assert spec.set(containers=[container, None]) == [True]
+    deployment = APIResources.Deployment()
+    assert deployment.set(_spec_template_spec=spec, replicas=0, revisionHistoryLimit=3) == [True] * 3
+    check_to_json(deployment)
+    assert utils.to_json(deployment)['spec'] == {
+        'revisionHistoryLimit': 3,
+        'template': {'spec': {'containers': [{'name': 'web', 'image': 'nginx', 'ports': [{'containerPort': 80}]}]}}
+    }
+
+@pytest.mark.parametrize('data', [
+    [1, None],
+    {'a': [1, None, [None, {}]], 'b': {'c': None}, 'd': 0, 'e': False},
+    {'a': [{'b': None}, {'b': 1}]},
+])
+def test_clean_null_matches_k8sgen(data):
+    from k8sgen import utils as k8sgen_utils
+    assert utils.clean_null(copy.deepcopy(data)) == k8sgen_utils.clean_null(copy.deepcopy(data))
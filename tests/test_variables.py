@@ -0,0 +1,90 @@
+import json
+import pytest
+import utils
+import variables
+from wheel_house import WheelHouse
+
+CONFIG = {'objects': [{'app': {'__settings__': {
+    'replicas': '${var.replicas|3}',
+    'name': 'app-${var.replicas|3}',
+    'flags': {'${var.replicas|3}': True}
+}}}]}
+
+@pytest.fixture
+def compass(tmp_path):
+    with open(tmp_path / 'config.json', 'w') as f:
+        json.dump(CONFIG, f)
+    with open(tmp_path / 'interactive.yaml', 'w') as f:
+        f.write('- prompt: "Replicas: "\n  variable: replicas\n')
+    return tmp_path
+
+def read_settings(compass, answers):
+    wh = WheelHouse(parse_args=False)
+    wh.set_log_level('NONE')
+    config_path, interactive_path = wh.get_compass_files(str(compass))
+    user_in = wh.get_user_input(interactive_path, answers)
+    return wh.read_config(config_path, user_in)['objects'][0]['app']['__settings__']
+
+@pytest.mark.parametrize('answers, environ', [
+    ({'replicas': 5}, {}),
+    ({'replicas': '5'}, {}),
+    (None, {'WH_VAR_REPLICAS': '5'}),
+])
+def test_answers_are_typed_whatever_the_source(compass, monkeypatch, answers, environ):
+    for k in environ:
+        monkeypatch.setenv(k, environ[k])
+    settings = read_settings(compass, answers)
+    # a whole reference is typed, references within longer strings and keys are text
+    assert settings == {'replicas': 5, 'name': 'app-5', 'flags': {'5': True}}
+
+def test_defaults(compass, monkeypatch):
+    monkeypatch.setattr('builtins.input', lambda prompt: '')
+    assert read_settings(compass, None) == {'replicas': 3, 'name': 'app-3', 'flags': {'3': True}}
+
+@pytest.mark.parametrize('answer, value', [
+    (True, True), ('true', True), ([1, 2], [1, 2]), ('[1, 2]', [1, 2]), ('"5"', '5'), ('web', 'web'), ('', '')
+])
+def test_typed_answers(compass, answer, value):
+    wh = WheelHouse(parse_args=False)
+    config = wh.read_config(str(compass / 'config.json'), {'replicas': answer})
+    assert config['objects'][0]['app']['__settings__']['replicas'] == value
+
+def test_fill_matches_unquoted_text_fill():
+    refs = variables.compile_refs(CONFIG)
+    for user_in in [{}, {'replicas': 5}, {'replicas': '5'}, {'replicas': [1, 2]}]:
+        # the whole references read the same as if they were written into the JSON unquoted
+        text = json.dumps(CONFIG).replace('"replicas": "${var.replicas|3}"', '"replicas": ${var.replicas|3}')
+        expected = json.loads(variables.fill_text(text, user_in))
+        assert variables.VariableTable(CONFIG, refs).fill(user_in) == expected
+
+YAML_CONFIG = """objects:
+  - app:
+      __settings__:
+        replicas: ${var.replicas|3}
+        quoted: "${var.replicas|3}"
+        port: 80${var.replicas|3}
+        name: app-${var.replicas|3}
+        list:
+          - ${var.replicas|3}
+        ${var.replicas|3}-key: true
+"""
+
+@pytest.mark.parametrize('user_in', [{}, {'replicas': 5}, {'replicas': '7'}, {'replicas': 'yes'}, {'replicas': ''}])
+def test_yaml_table_matches_text_fill(tmp_path, user_in):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(YAML_CONFIG)
+    configs = variables.ConfigCache()
+    assert configs.get(str(config_path)) != None
+    expected = utils.read_data(str(config_path), variables.fill_text(YAML_CONFIG, user_in))
+    assert configs.get(str(config_path)).fill(user_in) == expected
+
+@pytest.mark.parametrize('text', [
+    # in a comment
+    'objects: []  # ${var.replicas|3}\n',
+    # in a merged mapping
+    'base: &base\n  name: ${var.name|app}\nobjects:\n  - app:\n      <<: *base\n',
+])
+def test_yaml_filled_as_text(tmp_path, text):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(text)
+    assert variables.ConfigCache().get(str(config_path)) == None
@@ -0,0 +1,46 @@
+import argparse
+import os
+import wheel_house
+from wheel_house import WheelHouse
+
+
+def watch_args(compass, tmp_path):
+    answers = tmp_path / 'answers.yaml'
+    answers.write_text('env: prod\n')
+    return argparse.Namespace(name=compass, out=str(tmp_path / 'out'), answers=str(answers), interval='0', log_level='NONE')
+
+def touch(path, mtime):
+    with open(path, 'a') as f:
+        f.write('\n')
+    os.utime(path, ns=(mtime, mtime))
+
+def test_watched_files(compass):
+    template_dir = os.path.join(compass, 'templates', 'configmap')
+    for name in ['template.json.bak', 'template.json~', 'template.jsonc.swp']:
+        touch(os.path.join(template_dir, name), 1)
+    watched = WheelHouse(parse_args=False).get_watched_files(compass)
+    assert sorted(watched) == [os.path.join(compass, 'config.json'), os.path.join(template_dir, 'template.json')]
+
+def test_backup_files_do_not_rebuild(compass, tmp_path, monkeypatch):
+    template_dir = os.path.join(compass, 'templates', 'configmap')
+    # each sleep makes the next change to the compass, the last one stops watching
+    changes = [
+        lambda: touch(os.path.join(template_dir, 'template.jsonc.bak'), 10 ** 18),
+        lambda: touch(os.path.join(template_dir, 'template.json'), 10 ** 18),
+    ]
+    def sleep(seconds):
+        if len(changes) == 0:
+            raise KeyboardInterrupt
+        changes.pop(0)()
+    monkeypatch.setattr(wheel_house.time, 'sleep', sleep)
+    wh = WheelHouse(parse_args=False)
+    composed = []
+    compose = wh.compose
+    def count_compose(*args, **kwargs):
+        composed.append(args[0])
+        return compose(*args, **kwargs)
+    wh.compose = count_compose
+    wh.watch(watch_args(compass, tmp_path))
+    # the first render and the template edit, the backup file is ignored
+    assert len(composed) == 2
+    assert sorted(os.listdir(tmp_path / 'out')) == ['.wheelhouse-build.json', 'app-configmap.yaml', 'other-configmap.yaml']
@@ -0,0 +1,27 @@
+import copy
+import json
+import os
+import pytest
+from wheel_house import WheelHouse
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_every_failure_is_reported(tmp_path, capsys, compass, jobs):
+    config_path = os.path.join(compass, 'config.json')
+    with open(config_path) as f:
+        config = json.load(f)
+    # a loop over something that isn't a list fails to render, the object after the first failure is fine
+    config['objects'][0]['app']['configmap']['items'] = 1
+    config['objects'].append({'worse': copy.deepcopy(config['objects'][0]['app'])})
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    os.makedirs(tmp_path / 'out')
+
+    wh = WheelHouse(parse_args=False)
+    with pytest.raises(ValueError, match='Failed to compose 2 objects: app.configmap: TypeError: .*; worse.configmap: TypeError'):
+        wh.compose(compass, config_path, {}, 'ERROR', jobs=jobs, out_dir=str(tmp_path / 'out'))
+    assert os.listdir(tmp_path / 'out') == ['other-configmap.yaml']
+    errors = capsys.readouterr().out.splitlines()
+    assert len(errors) == 2
+    assert 'Failed to compose object app.configmap: TypeError' in errors[0]
+    assert 'Failed to compose object worse.configmap: TypeError' in errors[1]
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import tempfile
+
+# bump this whenever a change to rendering means earlier outputs can't be reused
+BUILD_DB_VERSION = 1
+BUILD_DB_FILE = '.wheelhouse-build.json'
+
+def hash_data(data):
+    text = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def hash_template(path):
+    """ Hash a template file, along with whether it reads files (${file.*} or ${files.*}) when it is built """
+    with open(path, 'rb') as f:
+        text = f.read()
+    return hashlib.sha256(text).hexdigest(), b'${file' in text
+
+
+class BuildDatabase:
+    def __init__(self, out_dir):
+        """
+        Record of the inputs each manifest in an output directory was built
+        from, so that a later build only renders the manifests whose inputs
+        changed. Each output file maps to a key hashed from its template
+        file, the object data it was rendered with and the user input. The
+        files read through ${file.*} and ${files.*} references aren't
+        tracked, so the outputs reading them have no key and are always
+        rebuilt
+        """
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, BUILD_DB_FILE)
+        self.outputs = {}
+        self.exists = False
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            # outputs from an older version of the renderer are all rebuilt
+            if data.get('version') == BUILD_DB_VERSION:
+                self.outputs = data['outputs']
+                self.exists = True
+
+    def get_key(self, template_hash, obj_data, user_in, reads_files=False):
+        """ Get the key of an output, None when it reads files (from its template, or references in its data) """
+        text = json.dumps([template_hash, obj_data, user_in], sort_keys=True, default=str)
+        if reads_files or '${file' in text:
+            return None
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def is_current(self, name, key, debug_path=None):
+        """ Check if an output was built from the same inputs and is still on disk """
+        if key == None or self.outputs.get(name) != key:
+            return False
+        if not os.path.exists(os.path.join(self.out_dir, name)):
+            return False
+        return debug_path == None or os.path.exists(debug_path)
+
+    def record(self, name, key):
+        self.outputs[name] = key
+
+    def remove_stale(self, names):
+        """
+        Remove the outputs recorded by an earlier build other than the given
+        outputs, returning the files that were removed. Anything else in the
+        output directory isn't ours and is left alone
+        """
+        removed = []
+        for name in sorted(self.outputs):
+            if name in names:
+                continue
+            path = os.path.join(self.out_dir, name)
+            # only ever files directly in the output directory, whatever the database holds
+            if os.path.basename(name) == name and os.path.isfile(path):
+                os.remove(path)
+                removed.append(name)
+            del self.outputs[name]
+        return removed
+
+    def clear(self):
+        """ Remove every output recorded by an earlier build so that everything is built again """
+        return self.remove_stale({})
+
+    def save(self):
+        # write to a temporary file first so a reader never sees a partial database
+        fd, temp_path = tempfile.mkstemp(dir=self.out_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': BUILD_DB_VERSION, 'outputs': self.outputs}, f, indent=4)
+        os.replace(temp_path, self.path)
+        self.exists = True
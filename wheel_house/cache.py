@@ -0,0 +1,209 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # without fcntl the index is only locked within this process
+    fcntl = None
+
+# the cache is bounded to this many bytes of extracted files
+CACHE_MAX_SIZE = 1024 * 1024 * 1024
+
+# flock only excludes other processes, threads of this one share this lock
+INDEX_LOCK = threading.Lock()
+
+def get_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'wheelhouse')
+
+def get_dir_size(path):
+    size = 0
+    for root, folders, filenames in os.walk(path):
+        for name in filenames:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+def load_definition(path):
+    """
+    Load a JSONC parser definition, keeping a plain JSON copy of it in the
+    cache which is much quicker to read than parsing the JSONC every start
+    """
+    stat = os.stat(path)
+    key = [os.path.abspath(path), stat.st_mtime_ns, stat.st_size]
+    cache_path = os.path.join(get_cache_dir(), 'definitions', hashlib.sha1(key[0].encode()).hexdigest() + '.json')
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached['key'] == key:
+            return cached['definition']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import jsonc
+    with open(path) as f:
+        definition = jsonc.load(f)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # write to a temporary file first so a reader never sees a partial definition
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'key': key, 'definition': definition}, f)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # the definition can still be used when the cache isn't writable
+        pass
+    return definition
+
+
+class CompassCache:
+    def __init__(self, path=None, max_size=CACHE_MAX_SIZE):
+        """
+        On disk cache of Compass packages. Packages are kept extracted under
+        compasses/ by the hash of the package, the index maps each name and
+        version to the hash of its package
+        """
+        self.path = path or get_cache_dir()
+        self.max_size = max_size
+        self.index_path = os.path.join(self.path, 'index.json')
+        self.lock_path = os.path.join(self.path, 'index.lock')
+        os.makedirs(os.path.join(self.path, 'compasses'), exist_ok=True)
+
+    def key(self, name, version):
+        return '{}/{}'.format(name, version)
+
+    def read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def write_index(self, index):
+        # write to a temporary file first so a reader never sees a partial index
+        fd, temp_path = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f, indent=4)
+        os.replace(temp_path, self.index_path)
+
+    @contextlib.contextmanager
+    def locked(self):
+        """ Hold the index lock so a read, update and write of the index can't interleave with another """
+        with INDEX_LOCK:
+            if fcntl == None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def compass_path(self, digest):
+        return os.path.join(self.path, 'compasses', digest)
+
+    def get(self, name, version):
+        """ Get the extracted Compass for a name and version, or None if it isn't cached """
+        with self.locked():
+            index = self.read_index()
+            key = self.key(name, version)
+            if not key in index or not os.path.isdir(self.compass_path(index[key]['hash'])):
+                return None
+            index[key]['last_used'] = time.time()
+            self.write_index(index)
+            return self.compass_path(index[key]['hash'])
+
+    def temp_dir(self):
+        """ Create a directory to extract a package into before it is added """
+        return tempfile.mkdtemp(dir=self.path)
+
+    def add(self, name, version, digest, path):
+        """
+        Add an extracted Compass package to the cache, path should come from
+        temp_dir() so it can be moved into place, returns the cached location
+        """
+        compass_path = self.compass_path(digest)
+
+        with self.locked():
+            # packages with the same contents are only stored once
+            if os.path.isdir(compass_path):
+                shutil.rmtree(path)
+            else:
+                os.replace(path, compass_path)
+
+            index = self.read_index()
+            index[self.key(name, version)] = {
+                'name': name,
+                'version': version,
+                'hash': digest,
+                'size': get_dir_size(compass_path),
+                'last_used': time.time()
+            }
+            self.evict(index, self.max_size, keep=[self.key(name, version)])
+            self.write_index(index)
+        return compass_path
+
+    def prune(self, max_size=0, keep=[]):
+        """
+        Evict the least recently used entries until the cache is no larger
+        than max_size bytes, returning the entries that were removed
+        """
+        with self.locked():
+            index = self.read_index()
+            removed = self.evict(index, max_size, keep)
+            self.write_index(index)
+        return removed
+
+    def evict(self, index, max_size, keep=[]):
+        """ Remove entries from index and their packages from disk, the caller must hold the lock """
+        # entries that share a package only take up space once
+        sizes = {}
+        for key in index:
+            sizes[index[key]['hash']] = index[key]['size']
+        total = sum(sizes.values())
+
+        removed = []
+        for key in sorted(index, key=lambda k: index[k]['last_used']):
+            if total <= max_size:
+                break
+            if key in keep:
+                continue
+            entry = index.pop(key)
+            removed.append(entry)
+            if not any(index[k]['hash'] == entry['hash'] for k in index):
+                total -= entry['size']
+                shutil.rmtree(self.compass_path(entry['hash']), ignore_errors=True)
+        return removed
+
+    def list(self):
+        index = self.read_index()
+        return sorted(index.values(), key=lambda e: (e['name'], e['version']))
+
+
+class ResponseCache:
+    def __init__(self, path=None):
+        """ On disk copies of frontend API responses along with their ETag and when they were stored """
+        self.path = os.path.join(path or get_cache_dir(), 'responses')
+        os.makedirs(self.path, exist_ok=True)
+
+    def entry_path(self, url):
+        return os.path.join(self.path, hashlib.sha1(url.encode()).hexdigest() + '.json')
+
+    def get(self, url):
+        path = self.entry_path(url)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def set(self, url, etag, data):
+        fd, temp_path = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'url': url, 'etag': etag, 'time': time.time(), 'data': data}, f)
+        os.replace(temp_path, self.entry_path(url))
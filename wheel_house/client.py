@@ -0,0 +1,86 @@
+import json
+import time
+import lazy
+import cache
+
+# requests is only loaded once a request is made
+requests = lazy.lazy_import('requests')
+
+# seconds to wait for a connection and for each read from the frontend API
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+
+# responses worth retrying, with an exponential backoff between attempts
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+class CompassClient:
+    def __init__(self, url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=3, backoff=0.5, pool_size=10, responses=None, ttl=0):
+        """
+        Client for the Compass frontend API. A single session is used so the
+        connections are kept alive and reused between requests, failed
+        requests are retried with an exponential backoff and JSON responses
+        are revalidated with their ETag instead of downloaded again. Cached
+        responses younger than ttl seconds are used without a request. The
+        client can be shared by threads making requests at the same time,
+        up to pool_size of them keep their connections open
+        """
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.ttl = ttl
+        self.responses = responses if responses != None else cache.ResponseCache()
+
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        retry_args = dict(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES, raise_on_status=False)
+        try:
+            retry = Retry(allowed_methods=['GET'], **retry_args)
+        except TypeError:
+            # urllib3 before 1.26 (as pinned by requests 2.22) calls it method_whitelist
+            retry = Retry(method_whitelist=['GET'], **retry_args)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_json(self, path):
+        """ Get a JSON response from the API, using the cached copy if it hasn't changed """
+        url = self.url + path
+        cached = self.responses.get(url)
+        headers = {}
+        if cached:
+            if self.ttl and time.time() - cached.get('time', 0) < self.ttl:
+                return cached['data']
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+
+        r = self.session.get(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+        if r.status_code == 304 and cached:
+            if self.ttl:
+                # revalidated, so it can be reused for another ttl
+                self.responses.set(url, cached['etag'], cached['data'])
+            return cached['data']
+        r.raise_for_status()
+
+        data = json.loads(r.content)
+        # responses without an ETag are only worth keeping for the ttl
+        if 'ETag' in r.headers or self.ttl:
+            self.responses.set(url, r.headers.get('ETag'), data)
+        return data
+
+    def stream(self, url):
+        """ Start a streamed download, the response should be used as a context manager """
+        r = self.session.get(url, timeout=self.timeout, allow_redirects=True, stream=True)
+        r.raise_for_status()
+        return r
+
+    def get_compass_info(self, name, version):
+        return self.get_json('/api/getCompassURLByNameAndVersion/' + name + '/' + version)
+
+    def get_compasses(self, name):
+        return self.get_json('/api/getCompassObjectsByName/' + name)
+
+    def search_compasses(self, name):
+        return self.get_json('/api/getCompassObjectsByFuzzyName/' + name)
+
+    def close(self):
+        self.session.close()
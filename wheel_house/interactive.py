@@ -1,24 +1,64 @@
+import re
 import utils
 import enums
 
+# environment variables with this prefix answer the prompt for a variable,
+# e.g. WH_VAR_REPLICAS answers the prompt for the replicas variable
+ENV_PREFIX = 'WH_VAR_'
+
 class Interactive:
     def __init__(self, path):
         """ Read in the prompts from the interactive file """
         self.prompts = utils.read_file(path)
+        self.variables = [p['variable'] for p in self.prompts if 'variable' in p.keys()]
+
+    def get_env_name(self, variable):
+        """ Get the name of the environment variable which answers a prompt """
+        return ENV_PREFIX + re.sub('[^A-Za-z0-9]', '_', variable).upper()
 
-    def do_prompt(self):
-        """ Ask the user for configuration information """
+    def get_answers(self, answers=None, environ=None):
+        """
+        Collect the answers given up front, from an answers file and from
+        the environment, with the environment taking precedence
+        """
+        user_in = {}
+        if answers:
+            unknown = [k for k in answers if not k in self.variables]
+            if unknown:
+                err = ValueError('Answers given for unknown variables: {}'.format(', '.join(unknown)))
+                raise err
+            # answers keep their types, they are only written out as text when filled into one
+            user_in.update(answers)
+        if environ:
+            for v in self.variables:
+                if self.get_env_name(v) in environ.keys():
+                    user_in[v] = environ[self.get_env_name(v)]
+        return user_in
+
+    def do_prompt(self, answers=None):
+        """ Ask the user for any configuration information that wasn't already answered """
         # we need _something_ in the dictionary even if the user decides to use all defaults
         # otherwise for some unknown reason it won't work
         user_in = {'__meta__': '__user_input__'}
+        if answers:
+            user_in.update(answers)
+
+        missing = [v for v in self.variables if not v in user_in.keys()]
+        if len(missing) == 0:
+            return user_in
 
         print('Please enter the information asked for in the following prompts in order to configure your deployment')
         # get the config information from the user
         for p in self.prompts:
-            answer = input(p['prompt'])
+            if 'variable' in p.keys() and p['variable'] in user_in.keys():
+                continue
+            try:
+                answer = input(p['prompt'])
+            except EOFError:
+                # there's no one to ask, the rest of the variables use their defaults
+                break
             if len(answer.strip()) > 0 and 'variable' in p.keys():
                 user_in[p['variable']] = answer
 
         # return the data
         return user_in
-            
\ No newline at end of file
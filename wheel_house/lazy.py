@@ -0,0 +1,18 @@
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """
+    Import a module the first time one of its attributes is used instead of
+    straight away, so a subcommand that never uses it doesn't pay for
+    loading it (and everything it imports) on every start
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
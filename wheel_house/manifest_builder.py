@@ -0,0 +1,75 @@
+import copy
+import functools
+import threading
+from k8sgen import builder, data_file
+import utils
+
+# the dotted key paths of the fields of each k8sgen type, along with a set of them
+KEY_STRINGS = {}
+KEY_STRINGS_LOCK = threading.Lock()
+
+def get_key_strings(obj):
+    """
+    Get the key paths of the fields of a k8sgen object's type, found once
+    for each type with the linear get_key_string instead of for every set
+    of a copy of the definition
+    """
+    key = (obj.data_source, obj.name)
+    if not key in KEY_STRINGS:
+        data = data_file.k8sgen_data[obj.data_source][obj.name]
+        if obj.data_source == 'api_resources_data':
+            data = data['json']
+        # the definition is only read, so it isn't copied
+        paths = utils.get_key_string(data)
+        with KEY_STRINGS_LOCK:
+            KEY_STRINGS[key] = (paths, set(paths))
+    return KEY_STRINGS[key]
+
+def set_fields(obj, **kwargs):
+    """ Set fields of a k8sgen object the same way its set does, returning the same results """
+    ret = []
+    key_strings, key_set = get_key_strings(obj)
+    for key, value in kwargs.items():
+        ky = key.replace('_', '.')
+        if ky.startswith('.'):
+            ky = ky[1:]
+            if ky in key_set:
+                obj.elements[ky] = value
+                ret.append(True)
+            else:
+                ret.append((False, 'invalid key name'))
+        else:
+            matches = [k for k in key_strings if k.endswith(ky)]
+            if len(matches) == 1:
+                obj.elements[matches[0]] = value
+                ret.append(True)
+            elif len(matches) == 0:
+                ret.append((False, 'invalid key name'))
+            else:
+                ret.append((False, 'ambiguous key name'))
+    return ret
+
+
+class ManifestBuilder(builder.K8sBuilder):
+    def get_obj(self, obj_type):
+        """
+        Create the k8sgen object for a component type. Its fields are set with
+        set_fields, so the key paths of its type aren't found again by every
+        set (k8sgen finds them in quadratic time from a copy of the definition)
+        """
+        obj = super().get_obj(obj_type)
+        if obj != None:
+            obj.set = functools.partial(set_fields, obj)
+        return obj
+
+    def handle_ref(self, ref_type, ref_path):
+        """
+        Resolve a reference the same way k8sgen does, except that a config
+        reference into a view (utils.ConfigView or memo.NameView) is looked
+        up without going through the mapping interface, which copies every
+        level it reads. Only the resolved value is copied, as the builder
+        may modify it
+        """
+        if ref_type == 'config' and hasattr(self.config_data, 'lookup'):
+            return copy.deepcopy(self.config_data.lookup(ref_path))
+        return super().handle_ref(ref_type, ref_path)
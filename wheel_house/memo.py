@@ -0,0 +1,153 @@
+import hashlib
+import json
+import re
+import threading
+from collections.abc import Mapping
+import utils
+
+# how many built manifests are kept
+MEMO_SIZE = 1024
+
+# compositions with fewer renders than this are built without the memo, they have
+# too few repeated components for the lookups to pay for themselves
+MIN_RENDERS = 16
+
+# the config references the builder resolves, the same pattern it finds them with
+CONFIG_REF_PATTERN = re.compile(r'\$\{config\.\S*\}')
+
+# stands in for the name of a list element while its manifest is built, so elements
+# differing only in name build the same manifest
+NAME_PLACEHOLDER = 'wheelhouse-element-name-placeholder'
+
+def find_config_refs(data, refs):
+    """ Add the key path of every config reference in the strings of a definition to refs """
+    if type(data) == str:
+        if '${config.' in data:
+            for r in CONFIG_REF_PATTERN.findall(data):
+                refs[tuple(r[2:-1].split('.')[1:])] = None
+    elif type(data) == dict:
+        for k in data:
+            find_config_refs(data[k], refs)
+    elif type(data) == list:
+        for d in data:
+            find_config_refs(d, refs)
+    return refs
+
+def lookup_ref(data, keys):
+    """ Get the value the builder resolves a config reference to, without copying it """
+    value = data
+    for k in keys:
+        if not k in value.keys():
+            return None
+        value = value.get_raw(k) if type(value) == utils.ConfigView else value[k]
+    return value
+
+def replace_name(data, name, replacement):
+    """ Copy data with every string equal to name replaced, keys and longer strings are left as they are """
+    if type(data) == str:
+        return replacement if data == name else data
+    if isinstance(data, dict):
+        return {k: replace_name(data[k], name, replacement) for k in data}
+    if type(data) == list:
+        return [replace_name(d, name, replacement) for d in data]
+    return data
+
+class NameView(Mapping):
+    def __init__(self, data, name, replacement):
+        """ Config data as the builder reads it, with name replaced in the values read from it """
+        self.data = data
+        self.name = name
+        self.replacement = replacement
+
+    def __getitem__(self, key):
+        value = self.data.get_raw(key) if type(self.data) == utils.ConfigView else self.data[key]
+        return replace_name(value, self.name, self.replacement)
+
+    def lookup(self, keys):
+        """ Get the value at a key path with name replaced, only copying what is found """
+        value = self.data.lookup(keys) if type(self.data) == utils.ConfigView else utils.get_from_key_list(self.data, keys)
+        return replace_name(value, self.name, self.replacement)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class RenderMemo:
+    def __init__(self, size=MEMO_SIZE):
+        """
+        Built manifests keyed by what the builder is given: the text rendered
+        from a template and the config values it references. A manifest is
+        only built once for components rendering the same text from the same
+        values, across objects and list elements. A list element is built
+        with its name replaced, so elements which differ only in name share a
+        manifest which just has the name put back in. The least recently used
+        manifest is dropped once there are more than size of them
+        """
+        self.size = size
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_key(self, contents, definition, obj_data, name=None):
+        """
+        Get the key of a render, None for renders which can't be reused
+        (reading files, or referencing config the builder would fail on). The
+        name of a list element only gets into its manifest through the config
+        references the builder fills in, e.g. ${config.__this__.__name__}, so
+        when a referenced value is the name the render is keyed with every
+        such value replaced, and the definition is returned with the key to
+        be built that way (None when it is built as it is)
+        """
+        if '${file' in contents:
+            return None, None
+        try:
+            refs = list(find_config_refs(definition, {}))
+            values = [lookup_ref(obj_data, list(keys)) for keys in refs]
+            values_text = json.dumps(values, default=str)
+            text = json.dumps(['text', contents, refs]) + values_text
+            # a value which is the name is a string of its own in the JSON of the values
+            if name != None and not '${' in name and json.dumps(name) in values_text and not NAME_PLACEHOLDER in contents + values_text:
+                generic_values = replace_name(values, name, NAME_PLACEHOLDER)
+                if generic_values != values:
+                    text = json.dumps(['name', contents, refs, generic_values], default=str)
+                    return hashlib.sha1(text.encode()).hexdigest(), definition
+        except (AttributeError, KeyError, TypeError):
+            return None, None
+        return hashlib.sha1(text.encode()).hexdigest(), None
+
+    def get(self, key):
+        """ Get the entry for a key, counting the hit or miss """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                # move it to the end, the most recently used
+                self.entries[key] = self.entries.pop(key)
+                return self.entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            while len(self.entries) > self.size:
+                del self.entries[next(iter(self.entries))]
+
+    def take(self):
+        """ Get the hit and miss counts, e.g. to send from a worker, and start again """
+        with self.lock:
+            counts = (self.hits, self.misses)
+            self.hits = 0
+            self.misses = 0
+        return counts
+
+    def merge(self, counts):
+        with self.lock:
+            self.hits += counts[0]
+            self.misses += counts[1]
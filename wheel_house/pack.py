@@ -0,0 +1,104 @@
+import io
+import json
+import os
+import tarfile
+import time
+import utils
+import template
+import variables
+
+def fill_defaults(config):
+    """ Fill in the default of every variable, as an install without answers would """
+    return variables.fill_text(config, {})
+
+def pack_config(config_path, config):
+    """
+    Get the index entry for a config. JSON and JSONC configs are kept as
+    plain JSON text with their variable references left in, which the
+    standard JSON parser reads far quicker than the JSONC one, as long as
+    rewriting the config leaves every reference exactly as it was
+    """
+    entry = {'file': os.path.basename(config_path), 'sha256': utils.hash_text(config)}
+    if not (config_path.endswith('.json') or config_path.endswith('.jsonc')):
+        return entry
+    try:
+        data = utils.read_data(config_path, config)
+    except ValueError:
+        # references outside of strings only parse once they are filled in
+        return entry
+    text = json.dumps(data, ensure_ascii=False, indent=0)
+    if [m.group(0) for m in variables.VARIABLE_PATTERN.finditer(text)] == [m.group(0) for m in variables.VARIABLE_PATTERN.finditer(config)]:
+        entry['json'] = text
+    return entry
+
+def get_obj_types(config_data):
+    """ Get every component type the objects of a config are rendered with """
+    obj_types = []
+    for obj_dict in config_data['objects']:
+        obj = list(obj_dict.keys())[0]
+        for obj_type in obj_dict[obj]:
+            if not obj_type.startswith('__') and not obj_type in obj_types:
+                obj_types.append(obj_type)
+    return obj_types
+
+def build_index(compass_path, config_path):
+    """
+    Check that a compass can be rendered and build the index it is packed
+    with: its config and the compiled template for each component type,
+    along with the file and hash each one came from so an install can tell
+    when the files no longer match it
+    """
+    with open(config_path) as f:
+        config = f.read()
+    try:
+        config_data = utils.read_data(config_path, fill_defaults(config))
+    except Exception as e:
+        err = ValueError('Could not parse {}: {}'.format(config_path, e))
+        raise err
+    if not isinstance(config_data, dict) or not 'objects' in config_data:
+        err = ValueError('{} has no objects to render'.format(config_path))
+        raise err
+
+    templates = {}
+    base = os.path.join(compass_path, 'templates')
+    for obj_type in get_obj_types(config_data):
+        path = utils.find_template(base, obj_type)
+        with open(path) as f:
+            contents = f.read()
+        try:
+            compiled = template.compile_template(contents)
+        except ValueError as e:
+            err = ValueError('Invalid template {}: {}'.format(path, e))
+            raise err
+        templates[obj_type] = {
+            'file': os.path.relpath(path, compass_path),
+            'sha256': utils.hash_text(contents),
+            'template': compiled.to_json()
+        }
+
+    return {
+        'version': utils.COMPASS_INDEX_VERSION,
+        'config': pack_config(config_path, config),
+        'templates': templates
+    }
+
+def pack_compass(compass_path, config_path, out_path):
+    """
+    Write a compass directory to a gzipped tarball along with its index,
+    returning the index. Like the tarballs made by hand, hidden files and
+    any index left in the directory are skipped
+    """
+    index = build_index(compass_path, config_path)
+    data = json.dumps(index, separators=(',', ':')).encode()
+
+    with tarfile.open(out_path, mode='w:gz') as tar:
+        for name in sorted(os.listdir(compass_path)):
+            if name.startswith('.') or name == utils.COMPASS_INDEX_FILE:
+                continue
+            tar.add(os.path.join(compass_path, name), arcname=name)
+        info = tarfile.TarInfo(utils.COMPASS_INDEX_FILE)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        tar.addfile(info, io.BytesIO(data))
+    return index
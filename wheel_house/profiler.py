@@ -0,0 +1,101 @@
+import contextlib
+import json
+import time
+
+# spans are disabled unless profiling so the hot path only pays for a shared no-op context
+NULL_SPAN = contextlib.nullcontext()
+
+# how many of the slowest object components the report lists
+REPORT_TOP = 10
+
+class Profiler:
+    def __init__(self, enabled=False):
+        """
+        Timing spans around the stages of an install, aggregated per stage
+        and per object component. A span is recorded under its stage along
+        with the object and component it was for, if any
+        """
+        self.enabled = enabled
+        self.spans = {}
+        self.start = time.perf_counter()
+
+    def span(self, stage, obj=None, obj_type=None):
+        if not self.enabled:
+            return NULL_SPAN
+        return self.timed(stage, obj, obj_type)
+
+    @contextlib.contextmanager
+    def timed(self, stage, obj, obj_type):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, obj, obj_type)
+
+    def add(self, stage, seconds, obj=None, obj_type=None, count=1):
+        key = (stage, obj, obj_type)
+        if not key in self.spans:
+            self.spans[key] = [0, 0.0]
+        self.spans[key][0] += count
+        self.spans[key][1] += seconds
+
+    def take(self):
+        """ Get the recorded spans as a list, e.g. to send from a worker, and start again """
+        spans = [(stage, obj, obj_type, count, seconds) for (stage, obj, obj_type), (count, seconds) in self.spans.items()]
+        self.spans = {}
+        return spans
+
+    def merge(self, spans):
+        for stage, obj, obj_type, count, seconds in spans:
+            self.add(stage, seconds, obj, obj_type, count=count)
+
+    def get_stages(self):
+        stages = {}
+        for (stage, obj, obj_type), (count, seconds) in self.spans.items():
+            if not stage in stages:
+                stages[stage] = [0, 0.0]
+            stages[stage][0] += count
+            stages[stage][1] += seconds
+        return stages
+
+    def get_components(self):
+        components = {}
+        for (stage, obj, obj_type), (count, seconds) in self.spans.items():
+            if obj == None:
+                continue
+            key = '{}.{}'.format(obj, obj_type)
+            if not key in components:
+                components[key] = {}
+            components[key][stage] = components[key].get(stage, 0.0) + seconds
+        return components
+
+    def report(self):
+        """ Get a table of the time spent in each stage and in the slowest components """
+        wall = time.perf_counter() - self.start
+        lines = ['{:24s} {:>8s} {:>12s} {:>8s}'.format('Stage', 'Calls', 'Seconds', '% wall')]
+        stages = self.get_stages()
+        for stage in sorted(stages, key=lambda s: stages[s][1], reverse=True):
+            count, seconds = stages[stage]
+            lines.append('{:24s} {:8d} {:12.4f} {:7.1f}%'.format(stage, count, seconds, seconds / wall * 100 if wall else 0))
+        lines.append('{:24s} {:>8s} {:12.4f}'.format('wall', '', wall))
+
+        components = self.get_components()
+        if components:
+            lines.append('')
+            lines.append('{:40s} {:>12s}  {}'.format('Slowest components', 'Seconds', 'Slowest stage'))
+            totals = {c: sum(components[c].values()) for c in components}
+            for c in sorted(totals, key=totals.get, reverse=True)[:REPORT_TOP]:
+                slowest = max(components[c], key=components[c].get)
+                lines.append('{:40s} {:12.4f}  {}'.format(c, totals[c], slowest))
+        return '\n'.join(lines)
+
+    def to_json(self):
+        return {
+            'wall_seconds': time.perf_counter() - self.start,
+            'stages': {s: {'calls': c, 'seconds': t} for s, (c, t) in self.get_stages().items()},
+            'components': self.get_components()
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=4)
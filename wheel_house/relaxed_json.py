@@ -0,0 +1,81 @@
+import re
+import sys
+import serializers
+
+# a comma at the end of a line before a closing bracket, as left by a removed block. This can't be
+# inside a string as strings don't span lines
+LINE_COMMA_PATTERN = re.compile(r',(?=[ \t\r]*\n\s*[}\]])')
+
+# possessive quantifiers (python 3.11 and later) stop the regex keeping every position it could
+# backtrack to, which makes it several times quicker
+POSSESSIVE = '+' if sys.version_info >= (3, 11) else ''
+
+# a comment which is dropped
+COMMENT = r'//[^\n]*{0}|/\*[^*]*{0}\*+{0}(?:[^/*][^*]*{0}\*+{0})*{0}/'.format(POSSESSIVE)
+
+# whitespace and comments between a trailing comma and the closing bracket after it
+GAP = r'(?:\s|{})*{}'.format(COMMENT, POSSESSIVE)
+
+# a single pass over the text, each match is a run of what is kept (group 1: anything but
+# strings, slashes and commas, strings, which may hold anything that looks like a comment, a
+# slash that doesn't start a comment and commas followed by another value) followed by a
+# comment or trailing comma, which is dropped. Anything that isn't matched (a quote which never
+# closes or a comment which never ends) is kept for the parser to report
+CLEAN_PATTERN = re.compile(
+    r'((?:[^"/,]+{0}|"[^"\\\n]*{0}(?:\\.[^"\\\n]*{0})*{0}"|/(?![/*])|,(?!{1}[}}\]]))+{0})|{2}|,'.format(POSSESSIVE, GAP, COMMENT)
+)
+
+class ParseError(ValueError):
+    def __init__(self, msg, text, pos, source=None):
+        """ Invalid JSON, with the line and column (both counted from 1) of where it went wrong in text """
+        self.msg = msg
+        self.text = text
+        self.pos = pos
+        self.source = source
+        self.line = text.count('\n', 0, pos) + 1
+        self.column = pos - text.rfind('\n', 0, pos)
+        if source:
+            super().__init__('{}: line {} column {}: {}'.format(source, self.line, self.column, msg))
+        else:
+            super().__init__('{}: line {} column {}'.format(msg, self.line, self.column))
+
+
+def clean(text):
+    """ Remove the comments and trailing commas from JSONC text """
+    return ''.join(filter(None, CLEAN_PATTERN.split(text)))
+
+def find_offset(text, pos):
+    """ Get the offset in text of a position in the output of clean(text) """
+    cleaned = 0
+    prev_index = 0
+    for m in CLEAN_PATTERN.finditer(text):
+        kept = [(prev_index, m.start())]
+        if m.group(1) is not None:
+            kept.append(m.span(1))
+        for start, end in kept:
+            if pos < cleaned + end - start:
+                return start + pos - cleaned
+            cleaned += end - start
+        prev_index = m.end()
+    return prev_index + pos - cleaned
+
+def loads(text):
+    """
+    Parse JSON which may have comments and trailing commas. A rendered
+    template usually only has the commas left at the end of a line by its
+    removed blocks, which are dropped in one pass of a regex before the fast
+    JSON parser is tried. Otherwise the comments and trailing commas are
+    dropped in one pass over the text, keeping strings as they are, before
+    parsing it again. A ParseError gives the line and column in text
+    """
+    try:
+        return serializers.load_json(LINE_COMMA_PATTERN.sub('', text))
+    except ValueError:
+        pass
+    try:
+        return serializers.load_json(clean(text))
+    except ValueError as e:
+        if not hasattr(e, 'pos'):
+            raise
+        err = ParseError(e.msg, text, find_offset(text, e.pos))
+        raise err
@@ -0,0 +1,82 @@
+import json
+import yaml
+from k8sgen import utils as k8sgen_utils
+
+# orjson is optional, the standard library is used when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def str_presenter(dumper, data):
+    # the same as k8sgen, multiline strings are written as blocks
+    if len(data.splitlines()) > 1:
+        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+    return dumper.represent_scalar('tag:yaml.org,2002:str', data)
+
+def represent_none(dumper, data):
+    return dumper.represent_scalar('tag:yaml.org,2002:null', '')
+
+def make_dumper(base):
+    """ Create a dumper writing manifests the same way k8sgen does """
+    dumper = type('ManifestDumper', (base,), {})
+    dumper.add_representer(str, str_presenter)
+    dumper.add_representer(type(None), represent_none)
+    return dumper
+
+PURE_YAML_LOADER = yaml.SafeLoader
+PURE_YAML_DUMPER = make_dumper(yaml.SafeDumper)
+
+# PyYAML's libyaml bindings are several times faster than the pure python loader and dumper
+if yaml.__with_libyaml__:
+    YAML_LOADER = yaml.CSafeLoader
+    YAML_DUMPER = make_dumper(yaml.CSafeDumper)
+else:
+    YAML_LOADER = PURE_YAML_LOADER
+    YAML_DUMPER = PURE_YAML_DUMPER
+FAST_JSON = orjson != None
+
+def use_pure_python():
+    """ Switch to the pure python backends, e.g. to compare against them """
+    global YAML_LOADER, YAML_DUMPER, FAST_JSON
+    YAML_LOADER = PURE_YAML_LOADER
+    YAML_DUMPER = PURE_YAML_DUMPER
+    FAST_JSON = False
+
+def get_backends():
+    return {
+        'yaml': 'libyaml' if YAML_LOADER != PURE_YAML_LOADER else 'python',
+        'json': 'orjson' if FAST_JSON else 'json'
+    }
+
+def load_json(text):
+    if FAST_JSON:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # let the standard library handle (or report) anything orjson doesn't accept, e.g. very large integers
+            pass
+    return json.loads(text)
+
+def load_yaml(stream):
+    return yaml.load(stream, Loader=YAML_LOADER)
+
+def compose_yaml(stream):
+    """ Get the node tree of a YAML document, which keeps how each scalar was written """
+    return yaml.compose(stream, Loader=YAML_LOADER)
+
+def load_yaml_value(text):
+    """ Read a value written into YAML without quotes, text which isn't valid YAML stays a string """
+    try:
+        return yaml.load(text, Loader=YAML_LOADER)
+    except yaml.YAMLError:
+        return text
+
+def dump_manifest(data):
+    """ Write out the json of a built k8sgen object as YAML, the same as its to_yaml """
+    try:
+        text = yaml.dump(data, Dumper=YAML_DUMPER)
+    except yaml.representer.RepresenterError:
+        # anything the safe dumper can't represent goes through the dumper k8sgen uses
+        text = yaml.dump(data)
+    return k8sgen_utils.fix_brace_strings(text)
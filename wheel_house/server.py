@@ -0,0 +1,212 @@
+import http.server
+import io
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+
+# how many filled in configs (one for each config file and set of answers) are kept
+CONFIG_CACHE_SIZE = 64
+
+# request bodies over this many bytes are refused
+MAX_REQUEST_SIZE = 1024 * 1024
+
+class RequestError(ValueError):
+    """ A render request which can't be handled as it was sent """
+
+
+class FilledConfigCache:
+    def __init__(self, size=CONFIG_CACHE_SIZE):
+        """
+        Config data with the user input filled in, keyed by the config file,
+        its size and modification time and the user input, the least recently
+        used entry is dropped once there are more than size of them. The data
+        is shared by every render of it, which only ever reads it through a
+        view. Each miss is read through the renderer, whose
+        variables.ConfigCache keeps the parsed config the answers are filled into
+        """
+        self.size = size
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, renderer, config_path, user_in):
+        stat = os.stat(config_path)
+        key = (os.path.abspath(config_path), stat.st_mtime_ns, stat.st_size, json.dumps(user_in, sort_keys=True, default=str))
+        with self.lock:
+            if key in self.entries:
+                # move it to the end, the most recently used
+                self.entries[key] = self.entries.pop(key)
+                return self.entries[key]
+
+        config_data = renderer.read_config(config_path, user_in)
+        with self.lock:
+            self.entries[key] = config_data
+            while len(self.entries) > self.size:
+                del self.entries[next(iter(self.entries))]
+        return config_data
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RenderService:
+    def __init__(self, renderers, api_url=None, log_level='NONE'):
+        """
+        Renders manifests for requests with warm renderers, each one has its
+        own builder (which holds the state of the manifest it is building)
+        while the compiled templates, parsed configs and built manifests are
+        shared by all of them. A request waits for a free renderer
+        """
+        self.api_url = api_url
+        self.log_level = log_level
+        self.templates = renderers[0].templates
+        self.memo = renderers[0].memo
+        self.configs = FilledConfigCache()
+        self.renderers = queue.Queue()
+        for renderer in renderers:
+            self.renderers.put(renderer)
+        self.start = time.time()
+        self.renders = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def get_compass(self, renderer, request):
+        if 'compass' in request:
+            compass_path = request['compass']
+            if type(compass_path) != str or not os.path.isdir(compass_path):
+                err = RequestError('compass must be the path of a Compass directory')
+                raise err
+            return compass_path
+        if 'name' in request and 'version' in request:
+            return renderer.get_compass(request['name'], request['version'], api_url=self.api_url)
+        err = RequestError('Either compass or name and version are required')
+        raise err
+
+    def render(self, request):
+        """
+        Render the manifests for a request, returning them as one
+        multi-document YAML stream along with how many there are
+        """
+        if type(request) != dict:
+            err = RequestError('The request must be a JSON object')
+            raise err
+        answers = request.get('answers') or {}
+        objects = request.get('objects')
+        if type(answers) != dict or (objects != None and type(objects) != list):
+            err = RequestError('answers must be an object and objects a list of object names')
+            raise err
+
+        start = time.perf_counter()
+        renderer = self.renderers.get()
+        try:
+            compass_path = self.get_compass(renderer, request)
+            config_path, interactive_path = renderer.get_compass_files(compass_path)
+            if not config_path:
+                err = RequestError('No configuration file found in {}'.format(compass_path))
+                raise err
+            try:
+                user_in = renderer.get_user_input(interactive_path, answers, prompt=False)
+            except ValueError as e:
+                # answers for variables the compass doesn't have
+                err = RequestError(str(e))
+                raise err
+            config_data = self.configs.get(renderer, config_path, user_in)
+            stream = io.StringIO()
+            count = renderer.compose(compass_path, config_path, user_in, self.log_level, config_data=config_data, stream=stream,
+                                     objects=objects)
+        except RequestError:
+            raise
+        except:
+            # only the renders that failed on our side, not bad requests
+            with self.lock:
+                self.failures += 1
+            raise
+        finally:
+            self.renderers.put(renderer)
+
+        with self.lock:
+            self.renders += 1
+        return {'count': count, 'seconds': time.perf_counter() - start, 'manifests': stream.getvalue()}
+
+    def get_stats(self):
+        return {
+            'status': 'ok',
+            'uptime_seconds': time.time() - self.start,
+            'renders': self.renders,
+            'failures': self.failures,
+            'templates': len(self.templates.templates),
+            'configs': len(self.configs),
+            'memo_hits': self.memo.hits,
+            'memo_misses': self.memo.misses
+        }
+
+
+class RenderHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, self.server.service.get_stats())
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path != '/render':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_SIZE:
+            self.send_json(413, {'error': 'Request is over {} bytes'.format(MAX_REQUEST_SIZE)})
+            self.close_connection = True
+            return
+
+        try:
+            request = json.loads(self.rfile.read(length) or b'null')
+            result = self.server.service.render(request)
+        except (json.JSONDecodeError, RequestError) as e:
+            self.send_json(400, {'error': '{}: {}'.format(type(e).__name__, e)})
+            return
+        except (Exception, SystemExit) as e:
+            self.send_json(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+            return
+        self.send_json(200, result)
+
+    def log_message(self, format, *args):
+        if self.server.log_requests:
+            print('{}{}'.format(self.server.log_prefix, format % args))
+
+
+class UnixRenderHandler(RenderHandler):
+    # there's no nagle on unix sockets to turn off
+    disable_nagle_algorithm = False
+
+
+class RenderHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, log_requests=False, log_prefix=''):
+        super().__init__(address, RenderHandler)
+        self.service = service
+        self.log_requests = log_requests
+        self.log_prefix = log_prefix
+
+
+class RenderUnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service, log_requests=False, log_prefix=''):
+        super().__init__(path, UnixRenderHandler)
+        self.service = service
+        self.log_requests = log_requests
+        self.log_prefix = log_prefix
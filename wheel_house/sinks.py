@@ -0,0 +1,32 @@
+import os
+
+# a sink takes each rendered manifest through write(obj, obj_type, manifest)
+
+class DirectorySink:
+    def __init__(self, out_dir='out'):
+        """ Write each manifest to its own <object>-<component type>.yaml file in out_dir, which is created if needed """
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+
+    def write(self, obj, obj_type, manifest):
+        with open(os.path.join(self.out_dir, '{}-{}.yaml'.format(obj, obj_type)), 'w') as f:
+            f.write(manifest)
+
+
+class StreamSink:
+    def __init__(self, stream):
+        """ Write every manifest to a text stream as the next document of one multi-document YAML stream """
+        self.stream = stream
+
+    def write(self, obj, obj_type, manifest):
+        self.stream.write('---\n')
+        self.stream.write(manifest)
+
+
+class CallbackSink:
+    def __init__(self, callback):
+        """ Call callback(obj, obj_type, manifest) for every manifest """
+        self.callback = callback
+
+    def write(self, obj, obj_type, manifest):
+        self.callback(obj, obj_type, manifest)
@@ -0,0 +1,430 @@
+import operator
+import os
+import re
+import utils
+import enums
+
+# a block tag is an inline comment marker followed by {% ... %}
+TAG_PATTERN = re.compile(r'(?://|#|;)\s*\{%\s*(.*?)\s*%\}')
+IF_PATTERN = re.compile(r'^if\s*(\S*)\s*(\S*)\s*(\S*)$')
+FOR_PATTERN = re.compile(r'^for\s*(\S*)\s*in\s*(\S*)$')
+END_IF_PATTERN = re.compile(r'^end\s*if$')
+END_FOR_PATTERN = re.compile(r'^end\s*for$')
+
+OPERATIONS = {
+    enums.Operators.IN: lambda left, right: left in right,
+    enums.Operators.EQUAL: operator.eq,
+    enums.Operators.NOT_EQUAL: operator.ne,
+    enums.Operators.LESS_THAN: operator.lt,
+    enums.Operators.GREATER_THAN: operator.gt,
+    enums.Operators.LESS_THAN_EQUAL: operator.le,
+    enums.Operators.GREATER_THAN_EQUAL: operator.ge,
+}
+
+def placeholder_pattern(var_names):
+    """
+    Build the pattern matching the references to any of the loop variables,
+    either "${<variable>.<path>}" (including the quotes) or ${<variable>.__name__}
+    """
+    names = '|'.join(re.escape(v) for v in sorted(set(var_names), key=len, reverse=True))
+    return re.compile(r'"\$\{(' + names + r')\.([^}\s]+)\}"|\$\{\s*(' + names + r')\.__name__\s*\}')
+
+def resolve(value, scope):
+    """
+    Turn one side of a conditional or the location of a loop into a value,
+    looking in the loop variables first and in the object data otherwise
+    """
+    # literals
+    if (value.startswith('"') and value.endswith('"')) or (value.startswith("'") and value.endswith("'")):
+        return value[1:-1]
+    if value.replace('.', '', 1).isdigit():
+        return float(value)
+
+    keys = value.split('.')
+    get_keys = keys[-1] == '__keys__'
+    if get_keys:
+        keys = keys[:-1]
+
+    if keys[0] in scope.variables:
+        data = scope.lookup(keys[0], keys[1:])
+    else:
+        data = utils.get_from_key_list(scope.obj_data, keys[1:])
+
+    if get_keys:
+        return list(data.keys())
+    return data
+
+
+class Scope:
+    def __init__(self, obj_data, variables=None):
+        """ Hold the object data and the loop variables bound while rendering """
+        self.obj_data = obj_data
+        self.variables = variables or {}
+
+    def bind(self, var_name, element_name, element_data):
+        """ Create a child scope with a loop variable bound to a list element """
+        variables = dict(self.variables)
+        variables[var_name] = (element_name, element_data)
+        return Scope(self.obj_data, variables)
+
+    def lookup(self, var_name, keys):
+        """ Get a value from the list element a loop variable is bound to """
+        element_name, element_data = self.variables[var_name]
+        if keys == ['__name__']:
+            return element_name
+        return utils.get_from_key_list(element_data, keys)
+
+
+class Text:
+    def __init__(self, text, start=0):
+        """ Plain text, start is where it is in the template file """
+        self.text = text
+        self.start = start
+
+    def render(self, scope, out):
+        out.append(self.text)
+
+    def trace(self, scope, pieces):
+        pieces.append((self.text, self.start, True))
+
+    def to_json(self):
+        return ['text', self.text]
+
+
+class Substitution:
+    def __init__(self, text, var_names, start=0):
+        """
+        Text containing references to loop variables. The references are
+        found once up front, leaving the literal pieces between them, so
+        filling in the values for an element is a single join
+        """
+        self.start = start
+        self.literals = []
+        self.refs = []
+        # where each literal and reference starts in the text
+        self.offsets = []
+        self.ref_offsets = []
+        prev_index = 0
+        for m in placeholder_pattern(var_names).finditer(text):
+            self.literals.append(text[prev_index:m.start()])
+            self.offsets.append(prev_index)
+            self.ref_offsets.append(m.start())
+            if m.group(1) is not None:
+                self.refs.append((m.group(1), m.group(2).split('.'), True))
+            else:
+                self.refs.append((m.group(3), ['__name__'], False))
+            prev_index = m.end()
+        self.literals.append(text[prev_index:])
+        self.offsets.append(prev_index)
+        self.set_parts()
+
+    @classmethod
+    def from_parts(cls, literals, refs):
+        """ Create a substitution from references which were already found """
+        substitution = cls.__new__(cls)
+        substitution.start = 0
+        substitution.offsets = [0] * len(literals)
+        substitution.ref_offsets = [0] * len(refs)
+        substitution.literals = literals
+        substitution.refs = [(var_name, keys, quoted) for var_name, keys, quoted in refs]
+        substitution.set_parts()
+        return substitution
+
+    def set_parts(self):
+        # each reference along with the literal text that follows it
+        self.parts = [ref + (literal,) for ref, literal in zip(self.refs, self.literals[1:])]
+
+    def substitute(self, lookup):
+        """ Fill in the references, lookup takes a variable name and a key list """
+        out = [self.literals[0]]
+        append = out.append
+        format_replacement = utils.format_replacement
+        for var_name, keys, quoted, literal in self.parts:
+            value = lookup(var_name, keys)
+            append(format_replacement(value) if quoted else str(value))
+            append(literal)
+        return ''.join(out)
+
+    def render(self, scope, out):
+        out.append(self.substitute(scope.lookup))
+
+    def trace(self, scope, pieces):
+        # the literals map back to the template a character at a time, each value to its reference
+        pieces.append((self.literals[0], self.start + self.offsets[0], True))
+        for (var_name, keys, quoted, literal), ref_offset, offset in zip(self.parts, self.ref_offsets, self.offsets[1:]):
+            value = scope.lookup(var_name, keys)
+            pieces.append((utils.format_replacement(value) if quoted else str(value), self.start + ref_offset, False))
+            pieces.append((literal, self.start + offset, True))
+
+    def to_json(self):
+        return ['sub', self.literals, self.refs]
+
+
+class Block:
+    def __init__(self, line, start=0):
+        self.line = line
+        self.start = start
+        self.body = []
+
+    def render_body(self, scope, out):
+        """ Render the block contents the same way a standalone block is laid out """
+        parts = []
+        for node in self.body:
+            node.render(scope, parts)
+        out.append(''.join(parts).strip() + '\n')
+
+    def trace_body(self, scope, pieces):
+        """ Trace the block contents, stripping them the same way render_body does """
+        parts = []
+        for node in self.body:
+            node.trace(scope, parts)
+        text = ''.join(p[0] for p in parts)
+        lead = len(text) - len(text.lstrip())
+        keep = len(text.strip())
+        for text, start, exact in parts:
+            cut = min(lead, len(text))
+            lead -= cut
+            text = text[cut:keep + cut]
+            keep -= len(text)
+            if text:
+                pieces.append((text, start + cut if exact else start, exact))
+        pieces.append(('\n', self.start, False))
+
+
+class If(Block):
+    def __init__(self, line, left, op, right, start=0):
+        """
+        <inline comment marker> {% if <left> <operator> <right> %}
+            <arbitatry contents>
+        <inline comment marker> {% end if %}
+        """
+        super().__init__(line, start)
+        self.left = left
+        self.operator = enums.Operators(op)
+        self.right = right
+
+    def holds(self, scope):
+        return OPERATIONS[self.operator](resolve(self.left, scope), resolve(self.right, scope))
+
+    def render(self, scope, out):
+        if self.holds(scope):
+            self.render_body(scope, out)
+
+    def trace(self, scope, pieces):
+        if self.holds(scope):
+            self.trace_body(scope, pieces)
+
+    def to_json(self):
+        return ['if', self.line, self.left, self.operator.value, self.right, [n.to_json() for n in self.body]]
+
+
+class For(Block):
+    def __init__(self, line, var_name, location, start=0):
+        """
+        <inline comment marker> {% for <variable> in <config section> %}
+            <arbitatry contents>
+        <inline comment marker> {% end for %}
+        """
+        super().__init__(line, start)
+        self.var_name = var_name
+        self.location = location
+
+    def scopes(self, scope):
+        """ Get the scope for each element of the list, with the loop variable bound to it """
+        for variable in resolve(self.location, scope):
+            variable_name = list(variable.keys())[0]
+            yield scope.bind(self.var_name, variable_name, variable[variable_name])
+
+    def render(self, scope, out):
+        for element_scope in self.scopes(scope):
+            self.render_body(element_scope, out)
+
+    def trace(self, scope, pieces):
+        for element_scope in self.scopes(scope):
+            self.trace_body(element_scope, pieces)
+
+    def to_json(self):
+        return ['for', self.line, self.var_name, self.location, [n.to_json() for n in self.body]]
+
+
+class Template:
+    def __init__(self, nodes, if_count, for_count):
+        self.nodes = nodes
+        self.if_count = if_count
+        self.for_count = for_count
+
+    def render(self, obj_data):
+        """
+        Evaluate the template against the data for an object, the commas left
+        dangling by removed blocks are left for relaxed_json.loads to drop
+        """
+        out = []
+        scope = Scope(obj_data)
+        for node in self.nodes:
+            node.render(scope, out)
+        return ''.join(out)
+
+    def find_source(self, obj_data, pos):
+        """
+        Get the offset in the template file of a position in the text rendered
+        for an object. Rendering is traced to get where each piece of text
+        came from, the text of the template maps back a character at a time
+        while a filled in value maps to its reference and the end of a block
+        to its opening tag
+        """
+        pieces = []
+        scope = Scope(obj_data)
+        for node in self.nodes:
+            node.trace(scope, pieces)
+        length = 0
+        start = 0
+        for text, start, exact in pieces:
+            if pos < length + len(text):
+                return start + pos - length if exact else start
+            length += len(text)
+        return start
+
+    def to_json(self):
+        """ Get the compiled tree as plain lists, which load_template turns back into a template """
+        return {'if_count': self.if_count, 'for_count': self.for_count, 'nodes': [n.to_json() for n in self.nodes]}
+
+
+def split_text(text, variables, start=0):
+    """ Get the node for a piece of text starting at start, which may reference the loop variables in scope """
+    if variables:
+        substitution = Substitution(text, variables, start)
+        if substitution.refs:
+            return [substitution]
+    return [Text(text, start)]
+
+def compile_template(contents):
+    """
+    Parse the contents of a template file into a tree of text, text with loop
+    variable references and if/for blocks which can be rendered any number of times
+    """
+    root = []
+    # stack of the blocks currently open
+    stack = []
+    variables = []
+    if_count = 0
+    for_count = 0
+
+    def body():
+        return stack[-1].body if stack else root
+
+    prev_index = 0
+    line = 1
+    line_index = 0
+    for m in TAG_PATTERN.finditer(contents):
+        line += contents.count('\n', line_index, m.start())
+        line_index = m.start()
+        tag = m.group(1)
+        if_match = IF_PATTERN.match(tag)
+        for_match = FOR_PATTERN.match(tag)
+
+        if not (if_match or for_match or END_IF_PATTERN.match(tag) or END_FOR_PATTERN.match(tag)):
+            # not one of our tags, leave it in the text
+            continue
+
+        body().extend(split_text(contents[prev_index:m.start()], variables, prev_index))
+        prev_index = m.end()
+
+        if if_match:
+            block = If(line, *if_match.groups(), start=m.start())
+            body().append(block)
+            stack.append(block)
+            if_count += 1
+        elif for_match:
+            block = For(line, *for_match.groups(), start=m.start())
+            body().append(block)
+            stack.append(block)
+            variables.append(block.var_name)
+            for_count += 1
+        elif END_IF_PATTERN.match(tag):
+            if not stack or type(stack[-1]) != If:
+                err = ValueError('Conditional statement count mismatch: unexpected end if on line {}'.format(line))
+                raise err
+            stack.pop()
+        else:
+            if not stack or type(stack[-1]) != For:
+                err = ValueError('For loop statement count mismatch: unexpected end for on line {}'.format(line))
+                raise err
+            stack.pop()
+            variables.pop()
+
+    if stack:
+        kind = 'Conditional' if type(stack[-1]) == If else 'For loop'
+        err = ValueError('{} statement count mismatch: block opened on line {} is never closed'.format(kind, stack[-1].line))
+        raise err
+
+    root.extend(split_text(contents[prev_index:], variables, prev_index))
+    return Template(root, if_count, for_count)
+
+
+def load_node(data):
+    kind = data[0]
+    if kind == 'text':
+        return Text(data[1])
+    if kind == 'sub':
+        return Substitution.from_parts(data[1], data[2])
+    if kind == 'if':
+        block = If(data[1], data[2], data[3], data[4])
+    elif kind == 'for':
+        block = For(data[1], data[2], data[3])
+    else:
+        err = ValueError('Unknown template node {}'.format(kind))
+        raise err
+    block.body = [load_node(n) for n in data[-1]]
+    return block
+
+def load_template(data):
+    """ Load a template compiled ahead of time from the output of its to_json """
+    return Template([load_node(n) for n in data['nodes']], data['if_count'], data['for_count'])
+
+
+class TemplateCache:
+    def __init__(self):
+        """
+        Compiled templates, keyed by template file path and modification
+        time. Compasses packed with an index have their templates loaded
+        from the trees compiled ahead of time, as long as the template file
+        still has the contents the index was built from
+        """
+        self.paths = {}
+        self.templates = {}
+        self.indexes = {}
+
+    def get_index(self, compass_path):
+        if not compass_path in self.indexes:
+            self.indexes[compass_path] = utils.read_compass_index(compass_path)
+        return self.indexes[compass_path]
+
+    def find(self, compass_path, obj_type):
+        """ Get the template file for a component type, only listing the directory once """
+        key = (compass_path, obj_type)
+        if not key in self.paths:
+            index = self.get_index(compass_path)
+            packed = index['templates'].get(obj_type) if index else None
+            if packed and os.path.isfile(os.path.join(compass_path, packed['file'])):
+                self.paths[key] = os.path.join(compass_path, packed['file'])
+            else:
+                self.paths[key] = utils.find_template(os.path.join(compass_path, 'templates'), obj_type)
+        return self.paths[key]
+
+    def get(self, compass_path, obj_type):
+        """ Get the compiled template for a component type, recompiling it if the file changed """
+        path = self.find(compass_path, obj_type)
+        mtime = os.stat(path).st_mtime_ns
+        if path in self.templates and self.templates[path][0] == mtime:
+            return self.templates[path][1]
+
+        with open(path) as f:
+            contents = f.read()
+        index = self.get_index(compass_path)
+        packed = index['templates'].get(obj_type) if index else None
+        if packed and os.path.join(compass_path, packed['file']) == path and packed['sha256'] == utils.hash_text(contents):
+            compiled = load_template(packed['template'])
+        else:
+            compiled = compile_template(contents)
+        self.templates[path] = (mtime, compiled)
+        return compiled
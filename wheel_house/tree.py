@@ -0,0 +1,95 @@
+# a transform is called with the key path (a tuple) and value of every node
+# below the root and returns the value to keep along with whether it should
+# still be applied to the children of that value
+
+def unset_placeholders(path, value):
+    """ Unset the <placeholder> values left over from the resource definitions """
+    if type(value) == str and value.startswith('<') and value.endswith('>'):
+        return None, False
+    return value, True
+
+def expand_components(components_list, to_json=None):
+    """ Replace components with their json (from to_json when given), which is not expanded any further """
+    components = set(components_list)
+    def expand(path, value):
+        if type(value).__name__ in components:
+            return (to_json(value) if to_json else value.to_json()), False
+        return value, True
+    return expand
+
+def substitute_elements(elements):
+    """ Replace the values at the dotted paths in elements, which are not substituted any further """
+    paths = {tuple(k.split('.')): v for k, v in elements.items()}
+    def substitute(path, value):
+        if path in paths:
+            return paths[path], False
+        return value, True
+    return substitute
+
+def child_path(path, key):
+    # keys containing dots are split so they match the dotted paths they would be written as
+    key = str(key)
+    if '.' in key:
+        return path + tuple(key.split('.'))
+    return path + (key,)
+
+def prune_node(node):
+    """ Remove the empty and falsy values from a dictionary or list """
+    if isinstance(node, dict):
+        if all(node.values()):
+            return
+        empty = [k for k, v in node.items() if not v]
+        for k in empty:
+            del node[k]
+    elif not all(node):
+        node[:] = [v for v in node if v]
+
+def walk(data, transforms, prune=False, path=None):
+    """
+    Apply the transforms to every node below data in place, in a single pass
+    over an explicit stack so deeply nested documents can't hit the recursion
+    limit. The transforms are applied in order, so a later one sees the value
+    an earlier one replaced. Key paths are only tracked when a root path is
+    given, items of a list share the path of the list. When prune is set,
+    empty and falsy values are removed once their children have been handled
+    from the same dictionaries and lists k8sgen's clean_null cleans: the
+    root dictionary, the dictionaries and lists in a cleaned dictionary and
+    the dictionaries in a cleaned list. A list in a list (or a root list)
+    is left as it is, along with everything below it
+    """
+    stack = [(data, path, transforms, prune and isinstance(data, dict), False)]
+    while stack:
+        node, path, active, pruned, handled = stack.pop()
+        if handled:
+            prune_node(node)
+            continue
+        if pruned:
+            # handled after everything pushed below it
+            stack.append((node, path, active, pruned, True))
+
+        is_dict = isinstance(node, dict)
+        if not active:
+            # only pruning below here
+            if pruned:
+                for value in (node.values() if is_dict else node):
+                    if isinstance(value, dict) or (is_dict and type(value) == list):
+                        stack.append((value, path, active, True, False))
+            continue
+
+        items = node.items() if is_dict else enumerate(node)
+        for key, value in items:
+            child = path
+            child_active = active
+            if is_dict and path != None:
+                child = path + (key,) if type(key) == str and not '.' in key else child_path(path, key)
+            for transform in active:
+                value, descend = transform(child, value)
+                if not descend:
+                    child_active = [t for t in child_active if t is not transform]
+            # replacing the value of an existing key doesn't change the size of the dictionary
+            node[key] = value
+            if isinstance(value, dict) or type(value) == list:
+                child_pruned = pruned and (isinstance(value, dict) or is_dict)
+                if child_active or child_pruned:
+                    stack.append((value, child, child_active, child_pruned, False))
+    return data
@@ -1,11 +1,28 @@
-import jsonc
 import json
-import yaml
 import os
 import tempfile
-import tarfile
-import requests
-import uuid
+import sys
+import concurrent.futures
+import lazy
+import hashlib
+import shutil
+import copy
+from collections.abc import Mapping
+import tree
+
+# only needed when handling packages or reading YAML or JSONC
+jsonc = lazy.lazy_import('jsonc')
+tarfile = lazy.lazy_import('tarfile')
+serializers = lazy.lazy_import('serializers')
+# the definitions of the k8sgen objects, only needed when building manifests
+k8sgen_data_file = lazy.lazy_import('k8sgen.data_file')
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# packed compasses carry an index of their parsed config and compiled templates,
+# bump the version whenever its layout changes so older indexes are ignored
+COMPASS_INDEX_FILE = 'wheelhouse-index.json'
+COMPASS_INDEX_VERSION = 1
 
 def get_json(obj):
     if type(obj) == dict:
@@ -14,17 +31,19 @@ def get_json(obj):
         return obj.to_json()
 
 def get_from_key_list(data, keys):
-    if not keys:
-        return data
-    # if the key doesn't exist then return None
-    if not keys[0] in data.keys():
-        return None
-    if len(keys) > 1:
-        # if we aren't at the last key then go a level deeper
-        return get_from_key_list(data[keys[0]], keys[1:])
-    else:
-        # return the value we want
-        return data[keys[0]]
+    for i, key in enumerate(keys):
+        if type(data) == ConfigView:
+            return data.lookup(keys[i:])
+        if isinstance(data, dict):
+            # if the key doesn't exist then return None
+            if not key in data:
+                return None
+            data = data[key]
+        elif type(data) == list and str(key).isdigit() and int(key) < len(data):
+            data = data[int(key)]
+        else:
+            return None
+    return data
 
 def set_from_key_list(data, keys, value):
     # if the key doesn't exist then return None
@@ -47,6 +66,102 @@ def set_from_key_list(data, keys, value):
         data[keys[0]] = value
     return data
 
+def copy_path(data, keys):
+    # shallow copy the dictionaries along a key path so it can be set
+    # without modifying the original data
+    data = copy.copy(data)
+    if keys and type(data) == dict and keys[0] in data.keys():
+        data[keys[0]] = copy_path(data[keys[0]], keys[1:])
+    return data
+
+class PathIndex:
+    def __init__(self, data):
+        """
+        Flattened index of config data by key path, covering list indexes
+        (e.g. ('ports', '0', 'name')), so resolving a reference is a dict hit
+        instead of a walk.
+        It is built once and must not outlive changes to the data
+        """
+        self.paths = {(): data}
+        stack = [((), data)]
+        while stack:
+            path, value = stack.pop()
+            items = value.items() if isinstance(value, dict) else enumerate(value)
+            for k, v in items:
+                child = path + (str(k),)
+                self.paths[child] = v
+                if isinstance(v, dict) or type(v) == list:
+                    stack.append((child, v))
+
+    def get(self, keys):
+        return self.paths.get(tuple(keys))
+
+
+class ConfigView(Mapping):
+    def __init__(self, data, overlay=None, index=None):
+        """
+        Copy-on-write view over config data, anything set through the view
+        (e.g. the __this__ key for a list element) goes into an overlay and
+        anything read through the mapping interface is copied, so the shared
+        config data is never modified by a render. Lookups go through the
+        index of the data when there is one, except under overlaid keys
+        """
+        self.data = data
+        self.overlay = overlay or {}
+        self.index = index
+
+    def child(self):
+        """ Create a view sharing the data and index whose overlay starts as a copy of this one """
+        return ConfigView(self.data, dict(self.overlay), self.index)
+
+    def get_raw(self, key):
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.data[key]
+
+    def __getitem__(self, key):
+        return copy.deepcopy(self.get_raw(key))
+
+    def __contains__(self, key):
+        return key in self.overlay or key in self.data
+
+    def __iter__(self):
+        yield from self.overlay
+        for k in self.data:
+            if not k in self.overlay:
+                yield k
+
+    def __len__(self):
+        return len(self.overlay) + len([k for k in self.data if not k in self.overlay])
+
+    def lookup(self, keys):
+        """ Get a value without copying it, the value must not be modified """
+        if not keys:
+            return self
+        if keys[0] in self.overlay:
+            # overlaid values aren't in the index
+            return get_from_key_list(self.overlay[keys[0]], keys[1:])
+        if self.index != None:
+            return self.index.get(keys)
+        if not keys[0] in self.data:
+            return None
+        return get_from_key_list(self.data[keys[0]], keys[1:])
+
+    def set(self, keys, value):
+        """
+        Set a value in the overlay, only copying the dictionaries along the
+        path. Lookups under the key stop using the index from then on
+        """
+        if len(keys) == 1:
+            self.overlay[keys[0]] = value
+        elif keys[0] in self:
+            self.overlay[keys[0]] = set_from_key_list(copy_path(self.get_raw(keys[0]), keys[1:-1]), keys[1:], value)
+
+    def to_dict(self):
+        out = dict(self.data)
+        out.update(self.overlay)
+        return out
+
 def add_in_values(data, values):
     for k in values:
         if values[k] != None:
@@ -63,105 +178,42 @@ def stringify(obj):
     return name + '(' + str_rep[:-2] + ')'
 
 def clean_null(d):
-    clean = {}
-    if type(d) == dict:
-        for k, v in d.items():
-            if type(v) == dict:
-                nested = clean_null(v)
-                if len(nested.keys()) > 0:
-                    clean[k] = nested
-            elif type(v) == list:
-                for i in range(0, len(v)):
-                    v[i] = clean_null(v[i])
-                v = [i for i in v if i]
-                if len(v) > 0:
-                    clean[k] = v
-            elif v:
-                clean[k] = v
-            for k in clean:
-                if clean[k] == {} or clean[k] == []:
-                    del clean[k]
-    else:
-        clean = d
-    return clean
+    return tree.walk(d, [], prune=True)
 
 def clean_unset(data):
-    if type(data) == dict:
-        for k in data:
-            if type(data[k]) == dict:
-                data[k] = clean_unset(data[k])
-            elif type(data[k]) == list:
-                data[k] = clean_unset(data[k])
-            elif type(data[k]) == str:
-                if data[k].startswith('<') and data[k].endswith('>'):
-                    data[k] = None
-    else:
-        for k in range(0, len(data)):
-            if type(data[k]) == dict:
-                data[k] = clean_unset(data[k])
-            elif type(data[k]) == list:
-                data[k] = clean_unset(data[k])
-            elif type(data[k]) == str:
-                if data[k].startswith('<') and data[k].endswith('>'):
-                    data[k] = None
-    return data
+    return tree.walk(data, [tree.unset_placeholders])
 
 def recurse_expand(data, components_list, indent=0):
-    # print(' ' * indent + str(data))
-    if type(data) == dict:
-        for k in data:
-            if type(data[k]).__name__ in components_list:
-                data[k] = data[k].to_json()
-            else:
-                if type(data[k]) == dict:
-                    data[k] = recurse_expand(data[k], components_list, indent = indent+2)
-                elif type(data[k]) == list:
-                    data[k] = recurse_expand(data[k], components_list, indent = indent+2)
-                elif type(data[k]) == str:
-                    if data[k].startswith('<') and data[k].endswith('>'):
-                        data[k] = None
-    else:
-        for k in range(0, len(data)):
-            if type(data[k]).__name__ in components_list:
-                data[k] = data[k].to_json()
-            else:
-                if type(data[k]) == dict:
-                    data[k] = recurse_expand(data[k], components_list, indent = indent+2)
-                elif type(data[k]) == list:
-                    data[k] = recurse_expand(data[k], components_list, indent = indent+2)
-                elif type(data[k]) == str:
-                    if data[k].startswith('<') and data[k].endswith('>'):
-                        data[k] = None
-    return data
+    return tree.walk(data, [tree.expand_components(components_list), tree.unset_placeholders])
 
 def recurse_build(data, key_list, elements, indent=0):
-    # print(' ' * indent + str(data))
-    if type(data) == dict:
-        for k in data:
-            key = '.'.join(key_list + [k])
-            if key in elements.keys():
-                data[k] = elements[key]
-            else:
-                if type(data[k]) == dict:
-                    data[k] = recurse_build(data[k], key_list + [k], elements, indent = indent+2)
-                elif type(data[k]) == list:
-                    data[k] = recurse_build(data[k], key_list + [k], elements, indent = indent+2)
-    else:
-        for k in range(0, len(data)):
-            key = '.'.join(key_list)
-            if key in elements.keys():
-                data[k] = elements[key]
-            else:
-                if type(data[k]) == dict:
-                    data[k] = recurse_build(data[k], key_list, elements, indent = indent+2)
-                elif type(data[k]) == list:
-                    data[k] = recurse_build(data[k], key_list, elements, indent = indent+2)
-    return data
+    return tree.walk(data, [tree.substitute_elements(elements)], path=tuple(key_list))
+
+def build_json(data, elements, components_list, to_json=None):
+    """
+    Fill in the elements of a resource definition, expand its components
+    (with to_json when given), unset its placeholders and clean out the null
+    values in a single pass
+    """
+    transforms = [tree.substitute_elements(elements), tree.expand_components(components_list, to_json), tree.unset_placeholders]
+    return tree.walk(data, transforms, prune=True, path=())
+
+def to_json(obj, components=None):
+    """
+    Write out a k8sgen object as json, the same as its to_json does with
+    separate build, expand and clean passes, in a single pass over a copy of
+    its definition. The components in it are written out the same way
+    """
+    if components == None:
+        components = set(k8sgen_data_file.k8sgen_data['components'])
+    data = k8sgen_data_file.k8sgen_data[obj.data_source][obj.name]
+    if obj.data_source == 'api_resources_data':
+        data = data['json']
+    return build_json(copy.deepcopy(data), obj.elements, components, lambda component: to_json(component, components))
 
 def get_key_string(data):
-    temp = list(get_paths(data))
-    ret = ['.'.join(a) for i, a in enumerate(temp) if a not in temp[:i]]
-    return ret
+    # a dict keeps the first occurrence of each path in order without a quadratic search
+    return list(dict.fromkeys('.'.join(a) for a in get_paths(data)))
 
 def get_paths(d, current = []):
     for a, b in d.items():
@@ -216,62 +268,172 @@ def format_replacement(data):
 def read_file(path):
     if path.endswith('.yaml') or path.endswith('.yml'):
         with open(path) as f:
-            data = yaml.safe_load(f)
+            data = serializers.load_yaml(f)
     elif path.endswith('.json'):
         with open(path) as f:
-            try:
-                data = jsonload(f)
-            except:
-                data = jsonc.load(f)
+            contents = f.read()
+        try:
+            data = serializers.load_json(contents)
+        except:
+            data = jsonc.loads(contents)
     elif path.endswith('.jsonc'):
         with open(path) as f:
             data = jsonc.load(f)
     return data
 
+def format_answer(value):
+    # answers are substituted into the config text so anything that isn't
+    # already a string is written out the way it would appear in JSON
+    if type(value) == str:
+        return value
+    return json.dumps(value)
+
 def read_data(path, data):
     if path.endswith('.yaml') or path.endswith('.yml'):
-        data = yaml.safe_load(data)
+        data = serializers.load_yaml(data)
     elif path.endswith('.json'):
         try:
-            data = json.loads(data)
+            data = serializers.load_json(data)
         except:
             data = jsonc.loads(data)
     elif path.endswith('.jsonc'):
         data = jsonc.loads(data)
     return data
 
+def read_compass_index(compass_path):
+    """ Get the index a compass was packed with, or None if it has no usable one """
+    path = os.path.join(compass_path, COMPASS_INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            index = serializers.load_json(f.read())
+    except ValueError:
+        return None
+    if type(index) != dict or index.get('version') != COMPASS_INDEX_VERSION:
+        return None
+    return index
+
+def hash_text(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+# the template file names of an object type, in the order they are looked for
+TEMPLATE_NAMES = ['template.yaml', 'template.yml', 'template.json', 'template.jsonc']
+
 def find_template(base, obj_type):
     files = os.listdir(os.path.join(base, obj_type))
-    if 'template.yaml' in files:
-        return os.path.join(base, obj_type, 'template.yaml')
-    if 'template.yml' in files:
-        return os.path.join(base, obj_type, 'template.yml')
-    if 'template.json' in files:
-        return os.path.join(base, obj_type, 'template.json')
-    if 'template.jsonc' in files:
-        return os.path.join(base, obj_type, 'template.jsonc')
+    for name in TEMPLATE_NAMES:
+        if name in files:
+            return os.path.join(base, obj_type, name)
     err = ValueError('No template file found for object type {}'.format(obj_type))
     raise err
 
-def download_compass(url, name, version):
-    temp_path = tempfile.mkdtemp()
-    uuid_name = str(uuid.uuid1())
+class HashingReader:
+    def __init__(self, chunks):
+        """
+        File-like reader over an iterator of byte chunks which hashes the
+        bytes as they are read, so a download can be extracted and verified
+        in a single pass
+        """
+        self.chunks = chunks
+        self.buffer = bytearray()
+        self.digest = hashlib.sha256()
 
-    path = temp_path + '/' + uuid_name
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.digest.update(chunk)
+            self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        out = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return out
+
+    def drain(self):
+        """ Read whatever is left so that the digest covers the whole stream """
+        for chunk in self.chunks:
+            self.digest.update(chunk)
+        self.buffer = bytearray()
+        return self.digest.hexdigest()
+
+def is_compass_member(member):
+    # only the config, the interactive prompts and the templates are used to
+    # compose the manifests, anything else bundled in the package is skipped
+    name = member.name
+    while name.startswith('./'):
+        name = name[2:]
+    if name.startswith('/') or '..' in name.split('/'):
+        return False
+    if '/' not in name and (name.startswith('config') or name.startswith('interactive') or name == COMPASS_INDEX_FILE):
+        return True
+    return name == 'templates' or name.startswith('templates/')
+
+def extract_compass(tar, path):
+    for member in tar:
+        if not is_compass_member(member) or not (member.isfile() or member.isdir()):
+            continue
+        if hasattr(tarfile, 'data_filter'):
+            tar.extract(member, path, filter='data')
+        else:
+            tar.extract(member, path)
 
-    r = requests.get(url + '/api/getCompassURLByNameAndVersion/' + name + '/' + version, allow_redirects=True)
-    data = json.loads(r.content)
+def download_compass(client, name, version, path):
+    """
+    Stream a Compass package straight into the extraction of its files
+    at path, returning the sha256 of the package
+    """
+    data = client.get_compass_info(name, version)
     compass_url = data['url']
-    r = requests.get(compass_url, allow_redirects=True)
-    open(path, 'wb').write(r.content)
 
-    return path, temp_path
+    with client.stream(compass_url) as r:
+        reader = HashingReader(r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE))
+        with tarfile.open(fileobj=reader, mode='r|gz') as tar:
+            extract_compass(tar, path)
+        digest = reader.drain()
 
-def list_compassess(url, name):
-    r = requests.get(url + '/api/getCompassObjectsByName/' + name, allow_redirects=True)
-    data = json.loads(r.content)
+    if 'sha256' in data.keys() and data['sha256'] != digest:
+        shutil.rmtree(path, ignore_errors=True)
+        err = ValueError('Checksum mismatch for Compass {} {}: expected {} but got {}'.format(name, version, data['sha256'], digest))
+        raise err
 
-    print('Compass Matches')
+    return digest
+
+def fetch_many(fetch, names, concurrency=1):
+    """
+    Call fetch for every name, up to concurrency of them at a time on a
+    thread pool, yielding (name, data, error) for each one as soon as it
+    finishes. Any exception raised by fetch is given as the error string
+    """
+    def fetch_one(name):
+        try:
+            return name, fetch(name), None
+        except Exception as e:
+            return name, None, '{}: {}'.format(type(e).__name__, e)
+
+    if concurrency <= 1 or len(names) <= 1:
+        for name in names:
+            yield fetch_one(name)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(fetch_one, name) for name in names]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+def read_names(path):
+    """ Read Compass names from a file (or stdin for -), one per line, ignoring blank lines and # comments """
+    if path == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(path) as f:
+            lines = f.readlines()
+    return [l.strip() for l in lines if l.strip() and not l.strip().startswith('#')]
+
+def print_compasses(data, name=None):
+    print('Compass Matches' if name == None else 'Compass Matches for ' + name)
     print()
     header = '{:32s} {:32s}'.format('Name', 'Version')
     print(header)
@@ -280,11 +442,8 @@ def list_compassess(url, name):
         line = '{:32s} {:32s}'.format(d['name'], d['version'])
         print(line)
 
-def search_compassess(url, name):
-    r = requests.get(url + '/api/getCompassObjectsByFuzzyName/' + name, allow_redirects=True)
-    data = json.loads(r.content)
-
-    print('Compass Fuzzy Matches')
+def print_matches(data, name=None):
+    print('Compass Fuzzy Matches' if name == None else 'Compass Fuzzy Matches for ' + name)
     print()
     header = '{:32s}'.format('Name')
     print(header)
@@ -298,8 +457,7 @@ def untar_compass(path, temp_path=None):
     if not temp_path:
         temp_path = tempfile.mkdtemp()
 
-    tar = tarfile.open(path)
-    tar.extractall(temp_path)
-    tar.close()
+    with tarfile.open(path, mode='r|*') as tar:
+        extract_compass(tar, temp_path)
 
-    return temp_path
\ No newline at end of file
+    return temp_path
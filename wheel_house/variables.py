@@ -0,0 +1,245 @@
+import os
+import re
+import utils
+import lazy
+
+# only needed to find the references of YAML configs
+yaml = lazy.lazy_import('yaml')
+serializers = lazy.lazy_import('serializers')
+
+# a reference to a compass variable along with its default, ${var.<variable>|<default>}
+VARIABLE_PATTERN = re.compile(r'\$\{var\.([^|}]*)\|([^}]*)\}')
+
+def fill_text(text, user_in):
+    """ Fill in the variable references of a piece of text, answers which aren't strings are written the way they appear in JSON """
+    return VARIABLE_PATTERN.sub(lambda m: utils.format_answer(user_in[m.group(1)]) if m.group(1) in user_in else m.group(2), text)
+
+def load_json_value(text):
+    """ Read a value written into JSON without quotes, text which isn't valid JSON stays a string """
+    try:
+        return serializers.load_json(text)
+    except ValueError:
+        return text
+
+
+class Site:
+    def __init__(self, text, load=None):
+        """
+        A string of the parsed config which references variables. A string
+        which is nothing but one reference is replaced by the answer (or its
+        default) without searching it again, otherwise the answers are filled
+        into the text. When there is a load function the filled in text is
+        typed with it, as if it had been written into the config unquoted,
+        while an answer which already has a type (e.g. from an answers file)
+        is used as it is for a whole reference
+        """
+        self.text = text
+        self.load = load
+        m = VARIABLE_PATTERN.fullmatch(text)
+        self.ref = m.groups() if m else None
+
+    def fill(self, data, user_in):
+        if self.ref:
+            name, default = self.ref
+            value = user_in[name] if name in user_in else default
+            if type(value) != str:
+                return value if self.load else utils.format_answer(value)
+        else:
+            value = fill_text(self.text, user_in)
+        return self.load(value) if self.load else value
+
+
+class Branch:
+    def __init__(self, children, keys):
+        """
+        The containers of the parsed config leading to the strings which
+        reference variables, children maps a key or index to the site or
+        branch under it and keys maps the keys which reference variables to
+        their site
+        """
+        self.children = children
+        self.keys = keys
+
+    def fill(self, data, user_in):
+        """ Copy the container with its references filled in, anything without references is shared with data """
+        if type(data) == list:
+            out = list(data)
+            for i in self.children:
+                out[i] = self.children[i].fill(data[i], user_in)
+            return out
+        if self.keys:
+            # keep the keys in the same order
+            out = {}
+            for k in data:
+                value = self.children[k].fill(data[k], user_in) if k in self.children else data[k]
+                out[self.keys[k].fill(k, user_in) if k in self.keys else k] = value
+            return out
+        out = dict(data)
+        for k in self.children:
+            out[k] = self.children[k].fill(data[k], user_in)
+        return out
+
+
+def compile_refs(data):
+    """
+    Get the branch (or site) of every variable reference under data, None
+    when there are none. A string which is nothing but a reference is typed
+    the way the answer reads as JSON, references within longer strings and
+    keys are filled in as text
+    """
+    if type(data) == str:
+        if '${var.' in data and VARIABLE_PATTERN.search(data):
+            return Site(data, load_json_value if VARIABLE_PATTERN.fullmatch(data) else None)
+        return None
+    if isinstance(data, dict):
+        children = {}
+        keys = {}
+        for k in data:
+            child = compile_refs(data[k])
+            if child:
+                children[k] = child
+            if type(k) == str and '${var.' in k and VARIABLE_PATTERN.search(k):
+                keys[k] = Site(k)
+        if children or keys:
+            return Branch(children, keys)
+    elif type(data) == list:
+        children = {}
+        for i in range(0, len(data)):
+            child = compile_refs(data[i])
+            if child:
+                children[i] = child
+        if children:
+            return Branch(children, {})
+    return None
+
+
+def compile_yaml_refs(node, data, sites):
+    """
+    compile_refs for a YAML config, from the node tree it was composed into
+    along with the data it was loaded as. A plain (unquoted) scalar is typed
+    by YAML once it is filled in, the same as when it is filled into the
+    text, and a quoted one stays a string. The text of every site is added
+    to sites. Raises ValueError when the nodes don't line up with the data
+    (e.g. merge keys), which have to be filled in as text
+    """
+    if isinstance(node, yaml.ScalarNode):
+        if '${var.' in node.value and VARIABLE_PATTERN.search(node.value):
+            if data != node.value:
+                err = ValueError('Reference {} was not loaded as a string'.format(node.value))
+                raise err
+            sites.append(node.value)
+            # plain scalars have no style, which libyaml gives as an empty string
+            return Site(node.value, serializers.load_yaml_value if not node.style else None)
+        return None
+    if isinstance(node, yaml.MappingNode):
+        if type(data) != dict or len(node.value) != len(data):
+            err = ValueError('Mapping at line {} does not match its data'.format(node.start_mark.line + 1))
+            raise err
+        children = {}
+        keys = {}
+        for (key_node, value_node), k in zip(node.value, data):
+            child = compile_yaml_refs(value_node, data[k], sites)
+            if child:
+                children[k] = child
+            if type(k) == str and '${var.' in k and VARIABLE_PATTERN.search(k):
+                sites.append(k)
+                keys[k] = Site(k)
+        if children or keys:
+            return Branch(children, keys)
+        return None
+    if isinstance(node, yaml.SequenceNode):
+        if type(data) != list or len(node.value) != len(data):
+            err = ValueError('Sequence at line {} does not match its data'.format(node.start_mark.line + 1))
+            raise err
+        children = {}
+        for i in range(0, len(data)):
+            child = compile_yaml_refs(node.value[i], data[i], sites)
+            if child:
+                children[i] = child
+        if children:
+            return Branch(children, {})
+    return None
+
+
+class VariableTable:
+    def __init__(self, data, refs):
+        """ A parsed config along with where each of its variable references are (the output of compile_refs) """
+        self.data = data
+        self.refs = refs
+
+    def fill(self, user_in):
+        """
+        Get the config data for a set of answers. Only the containers on the
+        way to a reference are copied, so the data may share the rest of the
+        tree with the parsed config and other fills of it
+        """
+        if self.refs == None:
+            return self.data
+        return self.refs.fill(self.data, user_in or {})
+
+
+class ConfigCache:
+    def __init__(self):
+        """
+        Parsed configs keyed by config file path, size and modification time,
+        so a config is only parsed once however many sets of answers it is
+        filled in with. A packed compass has its config parsed from the JSON
+        copy in its index when it matches the file. Configs which only parse
+        once their references are filled in, and YAML configs with references
+        the parsed tree doesn't hold (e.g. in comments or merged mappings),
+        have no table, they are filled in as text before every parse
+        """
+        self.tables = {}
+
+    def get(self, config_path):
+        """ Get the variable table of a config file, or None when it has to be filled in as text """
+        stat = os.stat(config_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        if config_path in self.tables and self.tables[config_path][0] == key:
+            return self.tables[config_path][1]
+
+        path, config = read_config_text(config_path)
+        table = None
+        if path.endswith('.json') or path.endswith('.jsonc'):
+            try:
+                data = utils.read_data(path, config)
+            except ValueError:
+                data = None
+            if data != None:
+                # the tree is only searched when the text has references
+                table = VariableTable(data, compile_refs(data) if VARIABLE_PATTERN.search(config) else None)
+        elif path.endswith('.yaml') or path.endswith('.yml'):
+            table = get_yaml_table(config)
+        self.tables[config_path] = (key, table)
+        return table
+
+
+def get_yaml_table(config):
+    """ Get the variable table of the text of a YAML config, None when it has to be filled in as text """
+    try:
+        data = serializers.load_yaml(config)
+        if not VARIABLE_PATTERN.search(config):
+            return VariableTable(data, None)
+        sites = []
+        refs = compile_yaml_refs(serializers.compose_yaml(config), data, sites)
+    except (ValueError, yaml.YAMLError):
+        return None
+    # every reference in the text has to be in the tree, otherwise some are where it can't fill them in
+    if sum(len(VARIABLE_PATTERN.findall(s)) for s in sites) != len(VARIABLE_PATTERN.findall(config)):
+        return None
+    return VariableTable(data, refs)
+
+def read_config_text(config_path):
+    """
+    Read in the text of a config, from the JSON copy of it in the index of a
+    packed compass when it matches the file, along with the path to parse
+    it as
+    """
+    with open(config_path) as f:
+        config = f.read()
+    index = utils.read_compass_index(os.path.dirname(config_path))
+    packed = index['config'] if index else None
+    if packed and 'json' in packed and packed['file'] == os.path.basename(config_path) and packed['sha256'] == utils.hash_text(config):
+        # the copy is plain JSON whatever the config was written in
+        return config_path + '.json', packed['json']
+    return config_path, config
@@ -1,19 +1,35 @@
-import jsonc
-import re
-from collections import namedtuple
-import yaml
 import utils
 import json
 import enums
-from k8sgen.builder import K8sBuilder
 from aphelper import core
 import os
-import copy
 from interactive import Interactive
 import shutil
+import cache
+import build_db
+import profiler
+from client import CompassClient
+import time
+import sys
+import glob
+import io
+import contextlib
+import concurrent.futures
+import lazy
+import variables
+
+# the rendering stack is only loaded by the subcommands that render
+manifest_builder = lazy.lazy_import('manifest_builder')
+template = lazy.lazy_import('template')
+serializers = lazy.lazy_import('serializers')
+cProfile = lazy.lazy_import('cProfile')
+pack = lazy.lazy_import('pack')
+server = lazy.lazy_import('server')
+sinks = lazy.lazy_import('sinks')
+relaxed_json = lazy.lazy_import('relaxed_json')
+memo = lazy.lazy_import('memo')
 
 # define global variables
-MatchObject = namedtuple("MatchObject", ["start", "end", "groups"])
 INFO_PREFIX  = "[ INFO  ] :: "
 DEBUG_PREFIX = "[ DEBUG ] :: "
 WARN_PREFIX  = "[ WARN  ] :: "
@@ -21,243 +37,237 @@ ERROR_PREFIX = "[ ERROR ] :: "
 
 FRONTEND_API = "http://localhost:8091"
 
+# manifests streamed with --output are written through a buffer of this many bytes
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# the WheelHouse used by a render worker process
+worker = None
+
+def init_worker(log_level, profile=False):
+    """ Set up the renderer for a worker process """
+    global worker
+    worker = WheelHouse(parse_args=False)
+    worker.builder = manifest_builder.ManifestBuilder()
+    worker.templates = template.TemplateCache()
+    worker.set_log_level(log_level)
+    worker.profiler.enabled = profile
+
+def install_job(install):
+    """
+    Install a single Compass from a batch in a worker process, returning the
+    manifest count, the time taken, the captured log and any error
+    """
+    log = io.StringIO()
+    count = 0
+    error = None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        try:
+            count = worker.install_compass(**install)
+        except (Exception, SystemExit) as e:
+            error = '{}: {}'.format(type(e).__name__, e)
+            if worker.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                print('{}Failed to install {}: {}'.format(ERROR_PREFIX, install['name'], error))
+    return count, time.perf_counter() - start, log.getvalue(), error
+
+def render_job(job):
+    """
+    Render a single object in a worker process, capturing anything logged
+    so that the parent can print it in order, along with the timing spans
+    and render memo counts so that the parent can add them to its own
+    """
+    log = io.StringIO()
+    rendered = None
+    error = None
+    with contextlib.redirect_stdout(log):
+        try:
+            rendered = worker.render_obj(*job)
+        except Exception as e:
+            error = '{}: {}'.format(type(e).__name__, e)
+    counts = worker.memo.take() if worker.memo != None else (0, 0)
+    return rendered, log.getvalue(), error, worker.profiler.take(), counts
+
 class WheelHouse:
 
-    def get_matches(self, pattern, text):
+    def handle_variables(self, config, user_in):
+        return variables.fill_text(config, user_in)
+
+    def render_obj(self, obj, obj_data, obj_type, compass_path, list_element=None, use_memo=True):
         """
-        Get all matches from a regex search and create a list of named tuples
-        containing the start and end character positions
-        along with the match contents
+        Render the template for an object and build the manifest from it,
+        returning the intermediate jsonc text (when debugging) along with the
+        manifest text. The render memo is only used when use_memo is set
         """
-        matches = []
-        for m in pattern.finditer(text):
-            matches.append(MatchObject(start=m.start(), end=m.end(), groups=m.groups()))
-        return matches
-
-    def check_for_loops(self, obj, config_data, obj_type, compass_path, contents=None):
+        # the object data is shared between renders so only ever read it through a view
+        if type(obj_data) != utils.ConfigView:
+            obj_data = utils.ConfigView(obj_data)
+        else:
+            obj_data = obj_data.child()
+        # create the __this__ key in the config
+        name = None
+        if list_element != None:
+            name = list(list_element.keys())[0]
+            this = dict(list_element[name])
+            this['__name__'] = name
+            obj_data.set(['__this__'], this)
+        # render the compiled template
+        with self.profiler.span('load_template', obj, obj_type):
+            compiled = self.templates.get(compass_path, obj_type)
+        if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
+            print('{}Found {} conditional blocks'.format(DEBUG_PREFIX, compiled.if_count))
+            print('{}Found {} for loop blocks'.format(DEBUG_PREFIX, compiled.for_count))
+        with self.profiler.span('render_template', obj, obj_type):
+            contents = compiled.render(obj_data)
+        with self.profiler.span('parse_json', obj, obj_type):
+            try:
+                out_data = relaxed_json.loads(contents)
+            except relaxed_json.ParseError as e:
+                err = self.template_error(e, compass_path, obj_type, obj_data)
+                raise err
+
+        # keep the intermediate data before the builder fills in the references
+        debug = None
+        if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
+            with self.profiler.span('dump_debug', obj, obj_type):
+                debug = json.dumps(out_data, indent=4)
+
+        # reuse the manifest built from the same text and config values
+        key, generic, entry = None, None, None
+        if use_memo:
+            if self.memo == None:
+                self.memo = memo.RenderMemo()
+            with self.profiler.span('memo_lookup', obj, obj_type):
+                key, generic = self.memo.get_key(contents, out_data, obj_data, name)
+                entry = self.memo.get(key) if key != None else None
+        if entry != None:
+            built_name, manifest, built_data = entry
+            if built_name == name or built_data == None:
+                return debug, manifest
+            # only the name differs, so it is put into the manifest data built with the placeholder
+            with self.profiler.span('dump_yaml', obj, obj_type):
+                return debug, serializers.dump_manifest(memo.replace_name(built_data, memo.NAME_PLACEHOLDER, name))
+
+        # build the manifest, from the definition with the name replaced when it can be reused for other names
+        config = obj_data
+        if generic != None:
+            out_data = generic
+            config = memo.NameView(obj_data, name, memo.NAME_PLACEHOLDER)
+        with self.profiler.span('build_manifest', obj, obj_type):
+            out = self.builder.build_manifest(definition=out_data, config=config)
+        with self.profiler.span('expand_manifest', obj, obj_type):
+            built_data = utils.to_json(out)
+            out_data = built_data if generic == None else memo.replace_name(built_data, memo.NAME_PLACEHOLDER, name)
+        with self.profiler.span('dump_yaml', obj, obj_type):
+            manifest = serializers.dump_manifest(out_data)
+        if key != None:
+            self.memo.put(key, (name, manifest, built_data if generic != None else None))
+        return debug, manifest
+
+    def template_error(self, e, compass_path, obj_type, obj_data):
         """
-        Check for blocks of template files of the form
-        <inline comment marker> {% for <variable> in <config section> %}
-            <arbitatry contents>
-        <inline comment marker> {% end for %}
-
-        If any are found, then the contents within the block are repeated according
-        to the loop
+        Turn an error parsing the text rendered from a template into one
+        pointing at the line and column of the template it came from
         """
-        # if we haven't passed the template file contents then
-        # we need to read in the template file
-        if not contents:
-            template_file = utils.find_template(os.path.join(compass_path, 'templates'), obj_type)
-            with open(template_file) as f:
-                contents = f.read()
-
-        # define regex patterns
-        begin_for_pattern = re.compile('(?:\/\/|#|;)\s*\{\%\s*for\s*(\S*)\s*in\s*(\S*)\s*\%\}')
-        end_for_pattern = re.compile('(?:\/\/|#|;)\s*\{\%\s*end\s*for\s*\%\}')
-
-        # get matches for each of the patterns
-        begin_for_matches = self.get_matches(begin_for_pattern, contents)
-        end_for_matches = self.get_matches(end_for_pattern, contents)
-
-        out = ''
-        
-        # check to make sure that for every for loop beginning we have an end
-        if len(begin_for_matches) != len(end_for_matches):
-            if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
-                print('{}Found {} beginning loop statements and {} ending loop statments'.format(ERROR_PREFIX, len(begin_for_matches), len(end_for_matches)))
-            err = ValueError('For loop statement count mismatch')
-            raise err
-
-        out_contents = ''
-        prev_index = 0
+        path = self.templates.find(compass_path, obj_type)
+        with open(path) as f:
+            contents = f.read()
+        # packed templates don't keep where their nodes came from, so this compiles the file again
+        pos = template.compile_template(contents).find_source(obj_data, e.pos)
+        msg = '{} (rendered line {} column {})'.format(e.msg, e.line, e.column)
+        return relaxed_json.ParseError(msg, contents, pos, source=os.path.relpath(path, compass_path))
+
+    def write_obj(self, obj, obj_type, debug, manifest, sink, debug_dir='debug'):
+        """
+        Write out a rendered manifest to a sink along with the intermediate
+        data if debug is specified
+        """
+        # write out the intermediate jsonc file if debug is specified
         if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
-            print('{}Found {} for loop blocks'.format(DEBUG_PREFIX, len(begin_for_matches)))
-
-        # loop through the matches
-        for i in range(0, len(begin_for_matches)):
-            # add the contents between loops to the final output file
-            out_contents += contents[prev_index:begin_for_matches[i].start]
-            prev_index = end_for_matches[i].end
-            # get the block to be repeated
-            repeat_contents = contents[begin_for_matches[i].end:end_for_matches[i].start]
-            repeat_contents = repeat_contents.strip()
-
-            # figure out what variable the user wants to use
-            var_name = begin_for_matches[i].groups[0]
-            # figure out where in the config document they want to loop
-            config_loc = begin_for_matches[i].groups[1]
-            config_objs = utils.get_from_key_list(config_data, config_loc.split('.')[1:])
-
-            # loop through the config location
-            for variable in config_objs:
-                variable_name = list(variable.keys())[0]
-                variable_data = variable[variable_name]
-                # define special variables that can be accessed
-                special_refs = {
-                    '__name__': variable_name
-                }
-                repeat_copy = repeat_contents
-                # replace any variable references in the repeat block
-                for ref in special_refs:
-                    repeat_copy = re.sub('\$\{\s*' + var_name + '\.' + ref + '\s*}', special_refs[ref], repeat_copy)
-                elements = re.findall('\$\{' + var_name + '\.(\S*)\}', repeat_copy)
-                for el in elements:
-                    item = utils.format_replacement(utils.get_from_key_list(variable_data, el.split('.')))
-                    repeat_copy = re.sub('"\$\{' + var_name + '\.' + el + '}"', item, repeat_copy)
-                # add the processed repeat block to the output contents
-                out_contents += repeat_copy + '\n'
+            debug_path = os.path.join(debug_dir, '{}-{}.jsonc'.format(obj, obj_type))
+            print("{}Writing out debug file at {}".format(DEBUG_PREFIX, debug_path))
+            with self.profiler.span('write_debug', obj, obj_type):
+                with open(debug_path, 'w') as f:
+                    f.write(debug)
 
-        out_contents += contents[prev_index:]
-        # remove invalid commas
-        out_contents = re.sub(',\n\s*\}', '\n}', out_contents)
-        out_contents = re.sub(',\n\s*\]', '\n]', out_contents)
+        # write out the manifest
+        with self.profiler.span('write', obj, obj_type):
+            sink.write(obj, obj_type, manifest)
 
-        return out_contents
+    def build_obj(self, config_data, obj, obj_data, obj_type, compass_path, sink, list_element=None, debug_dir='debug', use_memo=True):
+        debug, manifest = self.render_obj(obj, obj_data, obj_type, compass_path, list_element=list_element, use_memo=use_memo)
+        self.write_obj(obj, obj_type, debug, manifest, sink, debug_dir=debug_dir)
 
-    def check_for_conditionals(self, obj, config_data, obj_type, compass_path, contents=None):
+    def get_targets(self, config_data):
         """
-        Check for blocks of template files of the form
-        <inline comment marker> {% if <left> <operator> <right> %}
-            <arbitatry contents>
-        <inline comment marker> {% end if %}
-
-        If any are found, then the contents within the block are kept in
-        if they meet the confidition defined
+        Get the objects to build along with the component types for each of
+        them, a list component is built once for each of its elements
         """
-        # if we haven't passed the template file contents then
-        # we need to read in the template file
-        if not contents:
-            template_file = utils.find_template(os.path.join(compass_path, 'templates'), obj_type)
-            with open(template_file) as f:
-                contents = f.read()
-
-        # define regex patterns
-        begin_if_pattern = re.compile('(?:\/\/|#|;)\s*\{\%\s*if\s*(\S*)\s*(\S*)\s*(\S*)\s*\%\}')
-        end_if_pattern = re.compile('(?:\/\/|#|;)\s*\{\%\s*end\s*if\s*\%\}')
-
-        # get matches for each of the patterns
-        begin_if_matches = self.get_matches(begin_if_pattern, contents)
-        end_if_matches = self.get_matches(end_if_pattern, contents)
-
-        out = ''
-        
-        # check to make sure that for every for loop beginning we have an end
-        if len(begin_if_matches) != len(end_if_matches):
-            if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
-                print('{}Found {} beginning conditional statements and {} ending conditional statments'.format(ERROR_PREFIX, len(begin_if_matches), len(end_if_matches)))
-            err = ValueError('Conditional statement count mismatch')
-            raise err
-
-        out_contents = ''
-        prev_index = 0
-        if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
-            print('{}Found {} conditional blocks'.format(DEBUG_PREFIX, len(begin_if_matches)))
-
-        # loop through the matches
-        for i in range(0, len(begin_if_matches)):
-            # add the contents between loops to the final output file
-            out_contents += contents[prev_index:begin_if_matches[i].start]
-            prev_index = end_if_matches[i].end
-            # get the block to be conditionally evaluated
-            if_contents = contents[begin_if_matches[i].end:end_if_matches[i].start]
-            if_contents = if_contents.strip()
-
-            # get the parts of the if statement
-            left = begin_if_matches[i].groups[0].strip()
-            operator = enums.Operators(begin_if_matches[i].groups[1].strip())
-            right = begin_if_matches[i].groups[2].strip()
-
-            # figure out the type of the left part of the statement
-            if (left.startswith('"') and left.endswith('"')) or (left.startswith("'") and left.endswith("'")):
-                left = left[1:-1]
-            elif left.replace('.', '', 1).isdigit():
-                left = float(left)
-            elif left.endswith('.__keys__'):
-                left = list(utils.get_from_key_list(config_data, left.split('.')[1:-1]).keys())
-            else:
-                left = utils.get_from_key_list(config_data, left.split('.')[1:])
-
-            # figure out the type of the right side of the statement
-            if (right.startswith('"') and right.endswith('"')) or (right.startswith("'") and right.endswith("'")):
-                right = right[1:-1]
-            elif right.replace('.', '', 1).isdigit():
-                right = float(right)
-            elif right.endswith('.__keys__'):
-                right = list(utils.get_from_key_list(config_data, right.split('.')[1:-1]).keys())
-            else:
-                right = utils.get_from_key_list(config_data, right.split('.')[1:])
-
-            # perform the operation depending on the operator
-            if_result = False
-            if operator == enums.Operators.IN:
-                if_result = (left in right)
-            elif operator == enums.Operators.EQUAL:
-                if_result = (left == right)
-            elif operator == enums.Operators.NOT_EQUAL:
-                if_result = (left != right)
-            elif operator == enums.Operators.LESS_THAN:
-                if_result = (left < right)
-            elif operator == enums.Operators.GREATER_THAN:
-                if_result = (left > right)
-            elif operator == enums.Operators.LESS_THAN_EQUAL:
-                if_result = (left < right)
-            elif operator == enums.Operators.GREATER_THAN_EQUAL:
-                if_result = (left < right)
-
-            # if the statement evaluated to true, then add it to the output
-            if if_result:
-                out_contents += if_contents + '\n'
-
-        out_contents += contents[prev_index:]
-        # remove invalid commas
-        out_contents = re.sub(',\n\s*\}', '\n}', out_contents)
-        out_contents = re.sub(',\n\s*\]', '\n]', out_contents)
-
-        return out_contents
-
-    def handle_variables(self, config, user_in):
-        variable_pattern = '\$\{var\.(.*)\|(.*)\}'
-        config = re.sub(variable_pattern, lambda m: user_in.get(m.groups()[0]) if m.groups()[0] in user_in.keys() else m.groups()[1], config)
-        return config
+        for obj_dict in config_data['objects']:
+            obj = list(obj_dict.keys())[0]
+            obj_types = []
+            for obj_type in obj_dict[obj]:
+                if obj_type.startswith('__'):
+                    continue
+                if type(obj_dict[obj][obj_type]) == list:
+                    obj_types.append((obj_type, obj_dict[obj][obj_type]))
+                else:
+                    obj_types.append((obj_type, [None]))
+            yield obj, obj_dict[obj], obj_types
 
-    def build_obj(self, config_data, obj, obj_data, obj_type, compass_path, list_element=None):
-        # create the __this__ key in the config
-        if list_element != None:
-            name = list(list_element.keys())[0]
-            obj_data['__this__'] = list_element[name]
-            obj_data['__this__']['__name__'] = name
-        # check for template types
-        contents = self.check_for_conditionals(obj, obj_data, obj_type, compass_path)
-        contents = self.check_for_loops(obj, obj_data, obj_type, compass_path, contents=contents)
-        out_data = json.loads(contents)
+    def render_parallel(self, compass_path, targets, jobs, log_level, use_memo=True):
+        """
+        Render every object in a pool of worker processes, yielding the
+        results in the same order as the objects are defined
+        """
+        renders = []
+        for obj, obj_data, obj_types in targets:
+            for obj_type, elements in obj_types:
+                for el in elements:
+                    renders.append((obj, obj_data, obj_type, compass_path, el, use_memo))
+        chunksize = max(1, len(renders) // (jobs * 4))
 
-        # write out the intermediate jsonc file if debug is specified
-        if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
-            print("{}Writing out debug file at debug/{}-{}.jsonc".format(DEBUG_PREFIX, obj, obj_type))
-            with open('debug/{}-{}.jsonc'.format(obj, obj_type), 'w') as f:
-                json.dump(out_data, f, indent=4)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(log_level, self.profiler.enabled)) as pool:
+            yield from pool.map(render_job, renders, chunksize=chunksize)
 
-        # write out the manifest
-        out = self.builder.build_manifest(definition=out_data, config=obj_data)
-        with open('out/{}-{}.yaml'.format(obj, obj_type), 'w') as f:
-            f.write(out.to_yaml())
-            
-    def compose(self, compass_path, config_path, user_in, log_level):
-        """
-        Run the composition and create the manifest files
-        """
-        # get the config data
-        with open(config_path) as f:
-            config = f.read()
-        if user_in:
-            config = self.handle_variables(config, user_in)
-
-        config_data = utils.read_data(config_path, config)
-            
-        # create the builder object
-        self.builder = K8sBuilder()
-        
+    def get_stale_targets(self, builds, compass_path, targets, user_in, debug_dir):
+        """
+        Work out the build key of every manifest and drop the components
+        whose manifest is already current, returning the remaining targets
+        along with the keys and how many renders were skipped
+        """
+        template_hashes = {}
+        keys = {}
+        for obj, obj_data, obj_types in targets:
+            for obj_type, elements in obj_types:
+                if not obj_type in template_hashes:
+                    template_hashes[obj_type] = build_db.hash_template(self.templates.find(compass_path, obj_type))
+                name = '{}-{}.yaml'.format(obj, obj_type)
+                template_hash, reads_files = template_hashes[obj_type]
+                key = builds.get_key(template_hash, obj_data, user_in, reads_files=reads_files)
+                # objects sharing a name write to the same manifest so it depends on all of them,
+                # it is always rebuilt when any of them reads files
+                if name in keys:
+                    key = build_db.hash_data([keys[name], key]) if keys[name] != None and key != None else None
+                keys[name] = key
+
+        stale = []
+        skipped = 0
+        for obj, obj_data, obj_types in targets:
+            stale_types = []
+            for obj_type, elements in obj_types:
+                name = '{}-{}.yaml'.format(obj, obj_type)
+                debug_path = None
+                if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
+                    debug_path = os.path.join(debug_dir, '{}-{}.jsonc'.format(obj, obj_type))
+                if builds.is_current(name, keys[name], debug_path):
+                    skipped += 1
+                else:
+                    stale_types.append((obj_type, elements))
+            if stale_types:
+                stale.append((obj, obj_data, stale_types))
+        return stale, keys, skipped
 
+    def set_log_level(self, log_level):
         if log_level == 'NONE':
             self.LOG_LEVEL = enums.LogLevel.NONE.value
         elif log_level == 'ERROR':
@@ -269,89 +279,682 @@ class WheelHouse:
         elif log_level == 'DEBUG':
             self.LOG_LEVEL = enums.LogLevel.DEBUG.value
 
+    def read_config(self, config_path, user_in):
+        """
+        Read in the config data with the user input filled in. The config is
+        parsed once and kept along with where its variables are referenced,
+        so reading it again (with any answers) only fills them in
+        """
+        if self.configs == None:
+            self.configs = variables.ConfigCache()
+        with self.profiler.span('read_config'):
+            table = self.configs.get(config_path)
+        if table != None:
+            with self.profiler.span('handle_variables'):
+                return table.fill(user_in)
+
+        config_path, config = variables.read_config_text(config_path)
+        with self.profiler.span('handle_variables'):
+            config = self.handle_variables(config, user_in or {})
+        with self.profiler.span('read_config'):
+            return utils.read_data(config_path, config)
+
+    def compose(self, compass_path, config_path, user_in, log_level, jobs=1, out_dir='out', debug_dir='debug', builds=None,
+                config_data=None, timings=None, stream=None, objects=None, sink=None):
+        """
+        Run the composition and create the manifest files, returning how
+        many manifests were written. When a build database is given only the
+        manifests whose inputs changed since the last build are rendered,
+        the time taken by each render is added to timings if it is given.
+        When a stream is given every render is written to it as one
+        multi-document YAML stream instead of to out_dir, and when a sink is
+        given the renders go to it instead of either. When objects are given
+        only the objects with those names are rendered
+        """
+        if sink == None:
+            sink = sinks.StreamSink(stream) if stream != None else sinks.DirectorySink(out_dir)
+        if config_data == None:
+            config_data = self.read_config(config_path, user_in)
+
+        # create the builder object and template cache, they are kept for any later compositions
+        if self.builder == None:
+            self.builder = manifest_builder.ManifestBuilder()
+        if self.templates == None:
+            self.templates = template.TemplateCache()
+        if self.memo == None:
+            self.memo = memo.RenderMemo()
+        memo_start = (self.memo.hits, self.memo.misses)
+        
+        self.set_log_level(log_level)
+
         if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
             print('{}Composing manifests from configuration file: {}'.format(INFO_PREFIX, config_path))
         if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
-            if not os.path.exists('debug'):
-                os.mkdir('debug')
+            if not os.path.exists(debug_dir):
+                os.makedirs(debug_dir)
+
+        targets = list(self.get_targets(config_data))
+        if objects != None:
+            targets = [t for t in targets if t[0] in objects]
+        keys = None
+        if builds != None:
+            targets, keys, skipped = self.get_stale_targets(builds, compass_path, targets, user_in, debug_dir)
+            # the manifests of any objects left out aren't stale
+            removed = builds.remove_stale(keys) if objects == None else []
+            for name in removed:
+                if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
+                    print('{}Removed stale manifest {}'.format(DEBUG_PREFIX, os.path.join(out_dir, name)))
+            # mark the manifests about to be rebuilt as out of date so an interrupted build can't leave
+            # them marked current, they are still ours to remove later
+            for obj, obj_data, obj_types in targets:
+                for obj_type, elements in obj_types:
+                    builds.outputs['{}-{}.yaml'.format(obj, obj_type)] = None
+            builds.save()
+            if skipped and self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+                print('{}Skipping {} manifests with unchanged inputs'.format(INFO_PREFIX, skipped))
+
+        # the memo only pays for itself once there are enough renders for components to repeat
+        renders = sum(len(elements) for obj, obj_data, obj_types in targets for obj_type, elements in obj_types)
+        use_memo = renders >= memo.MIN_RENDERS
+
+        results = None
+        if jobs > 1:
+            results = self.render_parallel(compass_path, targets, jobs, log_level, use_memo=use_memo)
+        errors = []
+        count = 0
 
         # loop through the objects to be built
-        for obj_dict in config_data['objects']:
-            obj = list(obj_dict.keys())[0]
+        for obj, obj_data, obj_types in targets:
             if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
                 print("{}Processing compositions for {}".format(INFO_PREFIX, obj))
+            if results is None:
+                # index the object once for every component and list element rendered from it
+                obj_data = utils.ConfigView(obj_data, index=utils.PathIndex(obj_data))
             # loop through each component that is specified
-            for obj_type in obj_dict[obj]:
-                if obj_type.startswith('__'):
-                    continue
+            for obj_type, elements in obj_types:
                 if self.LOG_LEVEL >= enums.LogLevel.DEBUG.value:
                     print("{}Composing object {}.{}".format(DEBUG_PREFIX, obj, obj_type))
-                if type(obj_dict[obj][obj_type]) == list:
-                    for el in obj_dict[obj][obj_type]:
-                        self.build_obj(copy.deepcopy(config_data), obj, copy.deepcopy(obj_dict[obj]), obj_type, compass_path, list_element=el)
-                else:
-                    self.build_obj(copy.deepcopy(config_data), obj, copy.deepcopy(obj_dict[obj]), obj_type, compass_path)
+                for el in elements:
+                    if results is None:
+                        start = time.perf_counter()
+                        rendered, error = None, None
+                        try:
+                            rendered = self.render_obj(obj, obj_data, obj_type, compass_path, list_element=el, use_memo=use_memo)
+                        except Exception as e:
+                            # failures are collected the same way as for the worker processes
+                            error = '{}: {}'.format(type(e).__name__, e)
+                    else:
+                        # the worker output is replayed in order so the logs read the same as a serial run
+                        rendered, log, error, spans, counts = next(results)
+                        self.profiler.merge(spans)
+                        self.memo.merge(counts)
+                        print(log, end='')
+                    if error:
+                        if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                            print('{}Failed to compose object {}.{}: {}'.format(ERROR_PREFIX, obj, obj_type, error))
+                        errors.append((obj, obj_type, error))
+                    else:
+                        self.write_obj(obj, obj_type, *rendered, sink, debug_dir=debug_dir)
+                        count += 1
+                    if results is None and timings != None:
+                        timings.append((obj, obj_type, time.perf_counter() - start))
+
+        if use_memo and self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+            hits = self.memo.hits - memo_start[0]
+            misses = self.memo.misses - memo_start[1]
+            print('{}Render memo: {} hits, {} misses'.format(INFO_PREFIX, hits, misses))
+
+        if builds != None:
+            failed = ['{}-{}.yaml'.format(obj, obj_type) for obj, obj_type, error in errors]
+            for obj, obj_data, obj_types in targets:
+                for obj_type, elements in obj_types:
+                    name = '{}-{}.yaml'.format(obj, obj_type)
+                    if not name in failed:
+                        builds.record(name, keys[name])
+            builds.save()
+
+        if errors:
+            # the errors are also given here since the server only sends back the message of this one
+            failures = '; '.join('{}.{}: {}'.format(obj, obj_type, error) for obj, obj_type, error in errors)
+            err = ValueError('Failed to compose {} objects: {}'.format(len(errors), failures))
+            raise err
+
+        return count
+
+    def render(self, compass_path, user_in=None, objects=None, config_data=None, sink=None):
+        """
+        Render the manifests of an extracted Compass, yielding (object,
+        component type, manifest text) as each one is produced. Nothing is
+        written or logged along the way, unless a sink is given which every
+        manifest is also written to before it is yielded. user_in holds the
+        answers for the Compass variables, the ones it leaves out keep their
+        defaults. When objects are given only the objects with those names
+        are rendered. A WheelHouse only renders one manifest at a time, use
+        one for each thread rendering at the same time
+        """
+        config_path, interactive_path = self.get_compass_files(compass_path)
+        if not config_path:
+            err = ValueError('No configuration file found in {}'.format(compass_path))
+            raise err
+        if config_data == None:
+            config_data = self.read_config(config_path, user_in)
+        if self.builder == None:
+            self.builder = manifest_builder.ManifestBuilder()
+        if self.templates == None:
+            self.templates = template.TemplateCache()
+
+        for obj, obj_data, obj_types in self.get_targets(config_data):
+            if objects != None and not obj in objects:
+                continue
+            obj_data = utils.ConfigView(obj_data, index=utils.PathIndex(obj_data))
+            for obj_type, elements in obj_types:
+                for el in elements:
+                    debug, manifest = self.render_obj(obj, obj_data, obj_type, compass_path, list_element=el)
+                    if sink != None:
+                        sink.write(obj, obj_type, manifest)
+                    yield obj, obj_type, manifest
 
     def install(self, args):
         """ 
         Grab a Compass package and perform the manifest creation 
         """
-        if os.path.exists('out'):
-            shutil.rmtree('out')
-        os.mkdir('out')
+        answers = None
+        if args.answers:
+            answers = utils.read_file(args.answers)
+        install = dict(version=args.version, local=args.local, uncompressed=args.uncompressed, offline=args.offline,
+                       api_url=args.api_url, log_level=args.log_level, jobs=int(args.jobs), answers=answers, clean=args.clean)
+        self.profiler.enabled = args.profile or args.profile_json != None or args.profile_stats != None
+        self.profiler.start = time.perf_counter()
+        stats = None
+        if args.profile_stats:
+            stats = cProfile.Profile()
+
+        with contextlib.ExitStack() as stack:
+            if args.output == '-':
+                # the manifests go to stdout so the log, prompts and profile go to stderr
+                install['stream'] = stack.enter_context(open(sys.stdout.fileno(), 'w', buffering=OUTPUT_BUFFER_SIZE, closefd=False))
+                stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+            elif args.output:
+                install['stream'] = stack.enter_context(open(args.output, 'w', buffering=OUTPUT_BUFFER_SIZE))
+
+            if stats:
+                stats.enable()
+            self.install_compass(args.name, **install)
+            if stats:
+                stats.disable()
+                stats.dump_stats(args.profile_stats)
+
+            if self.profiler.enabled:
+                print(self.profiler.report())
+            if args.profile_json:
+                self.profiler.dump(args.profile_json)
+
+    def install_compass(self, name, version=None, local=False, uncompressed=False, offline=False, api_url=None,
+                        log_level='INFO', jobs=1, out_dir='out', debug_dir='debug', answers=None, clean=False, stream=None):
+        """
+        Get a Compass package and create its manifests in out_dir, returning
+        how many manifests were written. Manifests left in out_dir by an
+        earlier install are only rebuilt if their inputs changed, unless
+        clean is set. When a stream is given every manifest is written to it
+        instead and out_dir isn't used
+        """
+        self.set_log_level(log_level)
+
+        builds = None
+        if stream == None:
+            if not os.path.exists(out_dir):
+                os.makedirs(out_dir)
+            builds = build_db.BuildDatabase(out_dir)
+            # only the manifests of earlier builds are removed, the directory may hold anything else
+            if clean:
+                builds.clear()
+                builds.save()
         
-        if args.uncompressed:
-            compass_path = args.name
+        temp_path = None
+        if uncompressed:
+            compass_path = name
+        elif local:
+            with self.profiler.span('untar_compass'):
+                compass_path = utils.untar_compass(name)
+            temp_path = compass_path
         else:
-            if not args.local:
-                path, temp_path = utils.download_compass(FRONTEND_API, args.name, args.version)
-            else:
-                path = args.name
-                temp_path = None
-            compass_path = utils.untar_compass(path, temp_path)
+            compass_path = self.get_compass(name, version, offline, api_url)
+
+        config_path, interactive_path = self.find_compass_files(compass_path)
+        user_in = self.get_user_input(interactive_path, answers)
+
+        count = self.compose(compass_path, config_path, user_in, log_level, jobs=jobs, out_dir=out_dir, debug_dir=debug_dir, builds=builds,
+                             stream=stream)
 
+        if temp_path:
+            shutil.rmtree(temp_path)
+        return count
+
+    def get_compass_files(self, compass_path):
+        """ Get the config and interactive files of a Compass, either of which may be None """
         files = os.listdir(compass_path)
 
         # check for config and interactive file
+        config_path = None
+        interactive_path = None
         for fi in files:
             if fi.startswith('config'):
                 config_path = compass_path + '/' + fi
             elif fi.startswith('interactive'):
                 interactive_path = compass_path + '/' + fi
+        return config_path, interactive_path
 
+    def find_compass_files(self, compass_path):
+        """ Get the config and interactive files of a Compass, exiting if it has no config """
+        config_path, interactive_path = self.get_compass_files(compass_path)
         if not config_path:
             if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
                 print('{}No configuration file found in {}'.format(ERROR_PREFIX, compass_path))
             exit(1)
+        return config_path, interactive_path
+
+    def get_user_input(self, interactive_path, answers, prompt=True):
+        """
+        Get the values for the Compass variables from the answers, environment
+        and prompts. Without prompting only the answers are used and the
+        variables they don't cover keep their defaults
+        """
+        if interactive_path and not prompt:
+            user_in = {'__meta__': '__user_input__'}
+            user_in.update(Interactive(interactive_path).get_answers(answers))
+            return user_in
         if interactive_path:
+            # only prompt for what the answers file and environment don't cover
             interact = Interactive(interactive_path)
-            user_in = interact.do_prompt()
+            return interact.do_prompt(interact.get_answers(answers, os.environ))
+        elif answers:
+            user_in = {'__meta__': '__user_input__'}
+            user_in.update(answers)
+            return user_in
+        return None
+
+    def get_watched_files(self, compass_path):
+        """ Get the modification time of every config and template file of a Compass """
+        paths = glob.glob(os.path.join(compass_path, 'config*'))
+        # only the files find_template would read, not editor or backup copies of them
+        for name in utils.TEMPLATE_NAMES:
+            paths += glob.glob(os.path.join(compass_path, 'templates', '*', name))
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                # removed between listing and checking it
+                continue
+        return mtimes
+
+    def watch(self, args):
+        """
+        Keep the manifests of a local uncompressed Compass up to date,
+        re-rendering the affected ones whenever its config or templates change
+        """
+        self.set_log_level(args.log_level)
+        if self.builder == None:
+            self.builder = manifest_builder.ManifestBuilder()
+        compass_path = os.path.normpath(args.name)
+        out_dir = args.out
+        debug_dir = 'debug'
+        interval = float(args.interval)
+
+        answers = None
+        if args.answers:
+            answers = utils.read_file(args.answers)
+        config_path, interactive_path = self.find_compass_files(compass_path)
+        # the prompts are only answered once for the whole session
+        user_in = self.get_user_input(interactive_path, answers)
+
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        builds = build_db.BuildDatabase(out_dir)
+        config_data = None
+        mtimes = {}
+
+        if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+            print('{}Watching {} for changes, press Ctrl+C to stop'.format(INFO_PREFIX, compass_path))
+        try:
+            while True:
+                current = self.get_watched_files(compass_path)
+                if current == mtimes:
+                    time.sleep(interval)
+                    continue
+                changed = [p for p in current if mtimes.get(p) != current[p]] + [p for p in mtimes if not p in current]
+                mtimes = current
+
+                start = time.perf_counter()
+                timings = []
+                try:
+                    # the config is only parsed again when it changes, templates recompile themselves
+                    if config_data == None or config_path in changed:
+                        config_data = self.read_config(config_path, user_in)
+                    count = self.compose(compass_path, config_path, user_in, args.log_level, out_dir=out_dir, debug_dir=debug_dir,
+                                         builds=builds, config_data=config_data, timings=timings)
+                except Exception as e:
+                    config_data = None
+                    if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                        print('{}Failed to render {}: {}: {}'.format(ERROR_PREFIX, compass_path, type(e).__name__, e))
+                    continue
+
+                if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+                    for obj, obj_type, seconds in timings:
+                        print('{}Rendered {}.{} in {:.1f} ms'.format(INFO_PREFIX, obj, obj_type, seconds * 1000))
+                    print('{}Rebuilt {} manifests in {:.1f} ms'.format(INFO_PREFIX, count, (time.perf_counter() - start) * 1000))
+        except KeyboardInterrupt:
+            if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+                print('{}Stopped watching {}'.format(INFO_PREFIX, compass_path))
+
+    def get_batch_installs(self, args):
+        """
+        Read the batch manifest into the arguments for each install, every
+        Compass gets its own output and debug directories
+        """
+        batch = utils.read_file(args.manifest)
+        base_dir = os.path.dirname(os.path.abspath(args.manifest))
+
+        installs = []
+        for entry in batch['compasses']:
+            name = entry['name']
+            if entry.get('local') or entry.get('uncompressed'):
+                # local paths are relative to the batch manifest
+                name = os.path.join(base_dir, name)
+            label = entry.get('id') or os.path.basename(entry['name'].rstrip('/')).split('.tar')[0]
+            if entry.get('version') and not entry.get('id'):
+                label = '{}-{}'.format(label, entry['version'])
+
+            answers = None
+            if entry.get('answers'):
+                answers = utils.read_file(os.path.join(base_dir, entry['answers']))
+
+            installs.append({
+                'name': name,
+                'version': entry.get('version'),
+                'local': entry.get('local', False),
+                'uncompressed': entry.get('uncompressed', False),
+                'offline': args.offline,
+                'api_url': args.api_url,
+                'log_level': args.log_level,
+                'jobs': int(args.jobs),
+                'out_dir': entry.get('out', os.path.join(args.out, label)),
+                'debug_dir': os.path.join('debug', label),
+                'answers': answers
+            })
+        return installs
+
+    def install_many(self, args):
+        """
+        Install every Compass listed in a batch manifest in this process,
+        sharing the builder and template caches between them
+        """
+        self.set_log_level(args.log_level)
+        installs = self.get_batch_installs(args)
+        concurrency = int(args.concurrency)
+
+        if concurrency > 1:
+            # worker processes can't start render pools of their own
+            if int(args.jobs) > 1 and self.LOG_LEVEL >= enums.LogLevel.WARN.value:
+                print('{}--jobs is ignored when more than one Compass is installed at a time'.format(WARN_PREFIX))
+            for install in installs:
+                install['jobs'] = 1
+            with concurrent.futures.ProcessPoolExecutor(max_workers=concurrency, initializer=init_worker, initargs=(args.log_level,)) as pool:
+                results = list(pool.map(install_job, installs))
+            for count, seconds, log, error in results:
+                print(log, end='')
         else:
-            user_in = None
+            results = []
+            for install in installs:
+                start = time.perf_counter()
+                count = 0
+                error = None
+                try:
+                    count = self.install_compass(**install)
+                except (Exception, SystemExit) as e:
+                    error = '{}: {}'.format(type(e).__name__, e)
+                    if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                        print('{}Failed to install {}: {}'.format(ERROR_PREFIX, install['name'], error))
+                results.append((count, time.perf_counter() - start, '', error))
+
+        print()
+        header = '{:40s} {:16s} {:>10s} {:>10s} {:10s}'.format('Compass', 'Version', 'Manifests', 'Seconds', 'Status')
+        print(header)
+        print('{0}-{1}-{2}-{3}-{4}'.format(40 * '-', 16 * '-', 10 * '-', 10 * '-', 10 * '-'))
+        failed = 0
+        for install, (count, seconds, log, error) in zip(installs, results):
+            status = 'ok' if error == None else 'failed'
+            if error != None:
+                failed += 1
+            line = '{:40s} {:16s} {:10d} {:10.3f} {:10s}'.format(os.path.basename(install['name']), install['version'] or '', count, seconds, status)
+            print(line)
+
+        if failed:
+            if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                print('{}{} of {} Compasses failed to install'.format(ERROR_PREFIX, failed, len(installs)))
+            exit(1)
 
-        self.compose(compass_path, config_path, user_in, args.log_level)
+    def get_client(self, api_url=None, pool_size=10, ttl=0):
+        """
+        Get the client for the frontend API, it is shared so that its
+        connections are reused across requests
+        """
+        if self.client == None:
+            self.client = CompassClient(api_url or FRONTEND_API, pool_size=pool_size, ttl=ttl)
+        return self.client
 
-        if temp_path:
-            shutil.rmtree(temp_path)
+    def get_compass(self, name, version, offline=False, api_url=None):
+        """
+        Get the extracted Compass for a name and version from the package
+        cache, downloading it first if it hasn't been cached yet
+        """
+        compass_cache = cache.CompassCache()
+        compass_path = compass_cache.get(name, version)
+        if compass_path:
+            if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+                print('{}Using cached Compass {} {}'.format(INFO_PREFIX, name, version))
+            return compass_path
+
+        if offline:
+            if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                print('{}Compass {} {} is not cached and cannot be downloaded while offline'.format(ERROR_PREFIX, name, version))
+            exit(1)
+
+        temp_path = compass_cache.temp_dir()
+        try:
+            with self.profiler.span('download_compass'):
+                digest = utils.download_compass(self.get_client(api_url), name, version, temp_path)
+        except:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+        return compass_cache.add(name, version, digest, temp_path)
+
+    def pack_compasses(self, args):
+        """
+        Pack Compass directories into tarballs in the output directory, each
+        one checked and carrying an index of its config and compiled templates
+        """
+        self.set_log_level(args.log_level)
+        if not os.path.exists(args.out):
+            os.makedirs(args.out)
+
+        failed = 0
+        for compass_path in args.compass:
+            compass_path = compass_path.rstrip('/')
+            if not os.path.isdir(compass_path):
+                failed += 1
+                if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                    print('{}{} is not a Compass directory'.format(ERROR_PREFIX, compass_path))
+                continue
+            out_path = os.path.join(args.out, os.path.basename(compass_path) + '.tar.gz')
+            config_path, interactive_path = self.find_compass_files(compass_path)
+            try:
+                index = pack.pack_compass(compass_path, config_path, out_path)
+            except (ValueError, OSError) as e:
+                failed += 1
+                if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                    print('{}Could not pack {}: {}'.format(ERROR_PREFIX, compass_path, e))
+                continue
+            if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+                print('{}Packed {} with {} templates into {}'.format(INFO_PREFIX, compass_path, len(index['templates']), out_path))
+            if not 'json' in index['config'] and self.LOG_LEVEL >= enums.LogLevel.WARN.value:
+                print('{}The config of {} will be parsed from the file at install time'.format(WARN_PREFIX, compass_path))
+
+        if failed:
+            exit(1)
+
+    def serve(self, args):
+        """
+        Run a render service on localhost (or a unix socket) which keeps the
+        rendering stack, compiled templates and parsed configs warm between
+        requests
+        """
+        self.set_log_level(args.log_level)
+        # load the whole rendering stack up front rather than on the first request, the manifests
+        # built by any renderer are reused by all of them
+        self.templates = template.TemplateCache()
+        self.configs = variables.ConfigCache()
+        self.memo = memo.RenderMemo()
+        renderers = []
+        for i in range(0, max(1, int(args.renderers))):
+            renderer = WheelHouse(parse_args=False)
+            renderer.builder = manifest_builder.ManifestBuilder()
+            renderer.templates = self.templates
+            renderer.configs = self.configs
+            renderer.memo = self.memo
+            renderer.client = self.get_client(args.api_url)
+            renderers.append(renderer)
+        # the lazily imported modules are loaded now too, loading one from several threads at once isn't safe
+        serializers.get_backends()
+        relaxed_json.ParseError
+        utils.tarfile.TarFile
+
+        # renders only log their errors, the service logs each request at INFO
+        render_level = 'ERROR' if self.LOG_LEVEL >= enums.LogLevel.ERROR.value else 'NONE'
+        service = server.RenderService(renderers, api_url=args.api_url, log_level=render_level)
+        log_requests = self.LOG_LEVEL >= enums.LogLevel.INFO.value
+        if args.socket:
+            if os.path.exists(args.socket):
+                os.remove(args.socket)
+            render_server = server.RenderUnixServer(args.socket, service, log_requests, INFO_PREFIX)
+            address = args.socket
+        else:
+            render_server = server.RenderHTTPServer((args.host, int(args.port)), service, log_requests, INFO_PREFIX)
+            address = 'http://{}:{}'.format(*render_server.server_address[:2])
+
+        if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+            print('{}Serving renders on {} with {} renderers, press Ctrl+C to stop'.format(INFO_PREFIX, address, len(renderers)), flush=True)
+        try:
+            render_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            render_server.server_close()
+            if args.socket and os.path.exists(args.socket):
+                os.remove(args.socket)
+        if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+            print('{}Served {} renders'.format(INFO_PREFIX, service.renders))
+
+    def get_names(self, args):
+        """ Get the Compass names passed as arguments and in the names file, without duplicates """
+        names = list(args.name)
+        if args.names_file:
+            names += utils.read_names(args.names_file)
+        names = list(dict.fromkeys(names))
+        if not names:
+            if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                print('{}No Compass names given, pass them as arguments or with --names-file'.format(ERROR_PREFIX))
+            exit(1)
+        return names
+
+    def lookup_compasses(self, args, method, print_table):
+        """
+        Make a request for each of the Compass names at the same time, up to
+        --concurrency of them, and print every result as soon as it arrives,
+        either as a table or as a line of JSON
+        """
+        self.set_log_level(args.log_level)
+        names = self.get_names(args)
+        concurrency = int(args.concurrency)
+        client = self.get_client(args.api_url, pool_size=concurrency, ttl=float(args.cache_ttl))
+
+        failed = 0
+        for i, (name, data, error) in enumerate(utils.fetch_many(getattr(client, method), names, concurrency)):
+            if error != None:
+                failed += 1
+            if args.json:
+                result = {'name': name, 'data': data} if error == None else {'name': name, 'error': error}
+                print(json.dumps(result), flush=True)
+            elif error != None:
+                if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                    print('{}Request for {} failed: {}'.format(ERROR_PREFIX, name, error), flush=True)
+            else:
+                if i > 0:
+                    print()
+                # a single name keeps the table it always had
+                print_table(data, name if len(names) > 1 else None)
+                sys.stdout.flush()
+
+        if failed:
+            if self.LOG_LEVEL >= enums.LogLevel.ERROR.value:
+                print('{}{} of {} requests failed'.format(ERROR_PREFIX, failed, len(names)))
+            exit(1)
 
     def list_compasses(self, args):
         """
-        List all versions available for a given compass name
+        List all versions available for the given compass names
         """
-        utils.list_compassess(FRONTEND_API, args.name)
+        self.lookup_compasses(args, 'get_compasses', utils.print_compasses)
 
     def search_compasses(self, args):
         """
-        List all versions available for a given compass name
+        Fuzzy search for each of the given compass names
+        """
+        self.lookup_compasses(args, 'search_compasses', utils.print_matches)
+
+    def cache_list(self, args):
         """
-        utils.search_compassess(FRONTEND_API, args.name)
+        List the Compass packages in the local cache
+        """
+        entries = cache.CompassCache().list()
+
+        print('Cached Compasses')
+        print()
+        header = '{:32s} {:16s} {:12s} {:>12s} {:20s}'.format('Name', 'Version', 'Hash', 'Size (KB)', 'Last Used')
+        print(header)
+        print('{0}-{1}-{2}-{3}-{4}'.format(32 * '-', 16 * '-', 12 * '-', 12 * '-', 20 * '-'))
+        for e in entries:
+            last_used = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(e['last_used']))
+            line = '{:32s} {:16s} {:12s} {:12d} {:20s}'.format(e['name'], e['version'], e['hash'][:12], e['size'] // 1024, last_used)
+            print(line)
+
+    def cache_prune(self, args):
+        """
+        Remove the least recently used Compass packages from the local cache
+        """
+        self.set_log_level(args.log_level)
+        removed = cache.CompassCache().prune(max_size=int(float(args.max_size) * 1024 * 1024))
+        if self.LOG_LEVEL >= enums.LogLevel.INFO.value:
+            for e in removed:
+                print('{}Removed {} {} from the cache'.format(INFO_PREFIX, e['name'], e['version']))
+            print('{}Removed {} cached Compasses'.format(INFO_PREFIX, len(removed)))
 
-    def __init__(self):
+    def __init__(self, parse_args=True):
         """ 
         Create the Wheel House parser and get the arguments passed 
         """
-        ah = core.ArgparseHelper(def_file='data/parser.jsonc', parent=self)
-        ah.execute()
+        # compiled templates are shared by every object rendered, parsed configs by every read of them
+        self.templates = None
+        self.configs = None
+        self.memo = None
+        self.client = None
+        self.builder = None
+        self.profiler = profiler.Profiler()
+        self.LOG_LEVEL = enums.LogLevel.INFO.value
+
+        if parse_args:
+            ah = core.ArgparseHelper(def_data=cache.load_definition('data/parser.jsonc'), parent=self)
+            ah.execute()
 
 if __name__ == '__main__':
     WheelHouse()